@@ -0,0 +1,33 @@
+import cppyy, time
+
+# compare the cost of capturing C++ diagnostics from stderr (the default) with
+# passing them through (set_stderr_capture(False)), both for the capture alone
+# and for typical generated code declared in a loop
+
+N = 2000
+
+def benchit(what, callf, N):
+    tpre = time.perf_counter()
+    for i in range(N):
+        callf(i)
+    tpost = time.perf_counter()
+    print("  %-10s %8.3f us/call" % (what, (tpost - tpre)/N*1E6))
+
+def capture_only(i):
+    with cppyy._stderr_capture():
+        pass
+
+count = [0]
+def cppdef_loop(i):
+    count[0] += 1
+    cppyy.cppdef("namespace bench_capture { int f%d() { return %d; } }" % (count[0], i))
+
+def cppexec_loop(i):
+    cppyy.cppexec("bench_capture::f1();")
+
+for what, callf in (('capture only', capture_only), ('cppdef', cppdef_loop), ('cppexec', cppexec_loop)):
+    print("running:", what)
+    for enable in (True, False):
+        cppyy.set_stderr_capture(enable)
+        benchit(enable and 'capture' or 'passthrough', callf, N)
+cppyy.set_stderr_capture(True)
@@ -0,0 +1,31 @@
+import os, subprocess, sys, time
+
+# time "import cppyy" in fresh processes, with and without the lazy mode for
+# setting up std (CPPYY_LAZY_STD), also timing first use of the lazy bindings
+
+N = 20
+
+STMTS = [
+    ('import only',         'import cppyy'),
+    ('import + make_shared', 'import cppyy; cppyy.gbl.std.make_shared[int](42)'),
+    ('import + int8_t',      'import cppyy; cppyy.gbl.std.int8_t(42)'),
+]
+
+def timeit(stmt, lazy, N):
+    env = os.environ.copy()
+    env['CPPYY_LAZY_STD'] = lazy and '1' or '0'
+    timings = []
+    for i in range(N):
+        tpre = time.perf_counter()
+        subprocess.check_call([sys.executable, '-c', stmt], env=env)
+        timings.append(time.perf_counter() - tpre)
+    return min(timings), sum(timings)/N
+
+# warm up OS caches (and build the PCH, if needed)
+subprocess.check_call([sys.executable, '-c', 'import cppyy'])
+
+for what, stmt in STMTS:
+    print("running:", what)
+    for lazy in (False, True):
+        tmin, tavg = timeit(stmt, lazy, N)
+        print("  %-6s min: %.4fs  avg: %.4fs" % (lazy and 'lazy' or 'eager', tmin, tavg))
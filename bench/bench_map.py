@@ -0,0 +1,36 @@
+import cppyy, time
+
+# compare bulk conversion between std::map/unordered_map and Python dicts
+# (from_dict() and to_dict()) with element-wise construction and iteration
+
+N = 1000000
+
+std = cppyy.gbl.std
+
+def benchit(what, callf, arg):
+    tpre = time.perf_counter()
+    res = callf(arg)
+    tpost = time.perf_counter()
+    print("  %-14s %8.3f ms" % (what, (tpost - tpre)*1E3))
+    return res
+
+def elementwise_from(cls):
+    def fill(d):
+        m = cls()
+        for key, value in d.items():
+            m[key] = value
+        return m
+    return fill
+
+def elementwise_to(m):
+    return dict((p.first, p.second) for p in m)
+
+for tmpl, key in ((std.map, str), (std.unordered_map, str), (std.map, int), (std.unordered_map, int)):
+    cls = tmpl[key is str and 'std::string' or 'long', 'double']
+    print("running:", cls.__cpp_name__)
+    d = dict((key(i), float(i)) for i in range(N))
+    m = benchit('element-wise', elementwise_from(cls), d)
+    benchit('constructor', cls, d)
+    m = benchit('from_dict', cls.from_dict, d)
+    benchit('iterate', elementwise_to, m)
+    benchit('to_dict', cls.to_dict, m)
@@ -0,0 +1,69 @@
+import cppyy, time
+
+# compare access through properties made by py.make_property() with calling the
+# C++ accessors directly and with the former proxies, which looked up the
+# accessor on the instance on each access
+
+N = 1000000
+
+cppyy.cppdef("""namespace bench_properties {
+struct Plain { int fX = 0; int GetX() { return fX; } void SetX(int x) { fX = x; } };
+struct Virtual { virtual ~Virtual() {}
+    int fX = 0; virtual int GetX() { return fX; } virtual void SetX(int x) { fX = x; } };
+}""")
+
+class get_proxy(object):
+    def __init__(self, getter):
+        self.getter = getter
+    def __call__(self, obj):
+        return getattr(obj, self.getter)()
+
+class set_proxy(object):
+    def __init__(self, setter):
+        self.setter = setter
+    def __call__(self, obj, arg):
+        return getattr(obj, self.setter)(arg)
+
+cppyy.py.add_pythonization(
+    cppyy.py.make_property('Plain|Virtual', 'Get(\\w+)', 'Set(\\w+)'), 'bench_properties')
+
+def benchit(what, callf, arg):
+    tpre = time.perf_counter()
+    callf(arg)
+    tpost = time.perf_counter()
+    print("  %-14s %8.3f ms" % (what, (tpost - tpre)*1E3))
+
+def call_get(obj):
+    for i in range(N):
+        obj.GetX()
+
+def call_set(obj):
+    for i in range(N):
+        obj.SetX(i)
+
+def prop_get(obj):
+    for i in range(N):
+        obj.X
+
+def prop_set(obj):
+    for i in range(N):
+        obj.X = i
+
+def old_get(obj):
+    for i in range(N):
+        obj.oldX
+
+def old_set(obj):
+    for i in range(N):
+        obj.oldX = i
+
+for cls in (cppyy.gbl.bench_properties.Plain, cppyy.gbl.bench_properties.Virtual):
+    cls.oldX = property(get_proxy('GetX'), set_proxy('SetX'))
+    print("running:", cls.__cpp_name__)
+    obj = cls()
+    benchit('call getter', call_get, obj)
+    benchit('proxy get', old_get, obj)
+    benchit('property get', prop_get, obj)
+    benchit('call setter', call_set, obj)
+    benchit('proxy set', old_set, obj)
+    benchit('property set', prop_set, obj)
@@ -35,24 +35,50 @@ __author__ = 'Wim Lavrijsen <WLavrijsen@lbl.gov>'
 
 __all__ = [
     'cppdef',                 # declare C++ source to Cling
+    'cppdef_many',            # declare many C++ sources in one go
+    'transaction',            # context to collect cppdef calls for cppdef_many
+    'cppdef_async',           # declare C++ source to Cling in the background
     'cppexec',                # execute a C++ statement
     'macro',                  # attempt to evaluate a cpp macro
+    'macros',                 # attempt to evaluate many cpp macros
     'include',                # load and jit a header file
+    'include_async',          # load and jit a header file in the background
+    'include_stats',          # hits and misses of repeated includes
     'c_include',              # load and jit a C header file
     'load_library',           # load a shared library
     'nullptr',                # unique pointer representing NULL
     'sizeof',                 # size of a C++ type
     'typeid',                 # typeid of a C++ type
+    'sizeof_many',            # sizes of many C++ types in one go
+    'typeid_many',            # typeids of many C++ types in one go
     'multi',                  # helper for multiple inheritance
     'add_include_path',       # add a path to search for headers
     'add_library_path',       # add a path to search for headers
     'add_autoload_map',       # explicitly include an autoload map
     'set_debug',              # enable/disable debug output
+    'set_stderr_capture',     # enable/disable capture of C++ diagnostics
+    'build_pch',              # build a precompiled header of user headers
+    'startup_report',         # timing of the phases of importing cppyy
+    'instantiate',            # instantiate many template classes in one go
+    'template_stats',         # hits and misses of template instantiations
+    'replay_instantiations',  # instantiate templates recorded in the manifest
     ]
 
+from . import _startup                      # first, to time all of the import
 from ._version import __version__
 
-import ctypes, os, sys, sysconfig, warnings
+import atexit, collections, ctypes, itertools, os, re, struct, sys, sysconfig, threading, warnings, weakref
+
+# user-level PCH (CPPYY_PCH) and persistent cache of cppdef() sources, which is
+# precompiled from previous runs on top of the user-level PCH, if enabled
+from . import _pch
+_user_pch = _pch.user_pch()
+_cppdef_cache = _pch.CppdefCache.from_environ(_user_pch)
+if _cppdef_cache is not None:
+    _cppdef_cache.activate()
+    atexit.register(_cppdef_cache.save)
+if _user_pch is not None and not 'CLING_STANDARD_PCH' in os.environ:
+    _pch.select(_user_pch[0])
 
 if not 'CLING_STANDARD_PCH' in os.environ:
     def _set_pch():
@@ -65,6 +91,7 @@ if not 'CLING_STANDARD_PCH' in os.environ:
         except (ImportError, AttributeError):
             pass
     _set_pch(); del _set_pch
+_startup.mark('pch')
 
 try:
     import __pypy__
@@ -79,6 +106,7 @@ if ispypy:
     from ._pypy_cppyy import *
 else:
     from ._cpython_cppyy import *
+_startup.mark('backend')
 
 
 #- allow importing from gbl --------------------------------------------------
@@ -89,17 +117,44 @@ sys.modules['cppyy.gbl.std'] = gbl.std
 #- enable auto-loading -------------------------------------------------------
 try:    gbl.gInterpreter.EnableAutoLoading()
 except: pass
+_startup.mark('autoloading')
+
+
+#- lazy mode for setting up std ---------------------------------------------
+class _lazy_attribute(object):
+    """Placeholder for an attribute of a C++ scope, resolved on first access. If
+    resolution fails, the C++ entity of the same name, if any, is used."""
+    __slots__ = ['name', 'resolve']
+    def __init__(self, name, resolve):
+        self.name    = name
+        self.resolve = resolve
+    def __get__(self, obj, scope):
+        delattr(scope, self.name)
+        try:
+            value = self.resolve()
+        except (AttributeError, TypeError):
+            return getattr(scope, self.name)
+        setattr(scope, self.name, value)
+        return value
+
+_lazy_std = os.environ.get('CPPYY_LAZY_STD', '0')
+_lazy_std = _lazy_std != '0' and _lazy_std.lower() != 'false'
 
 
 #- external typemap ----------------------------------------------------------
 from . import _typemap
 _typemap.initialize(_backend)               # also creates (u)int8_t mapper
 
-try:
-    gbl.std.int8_t  = gbl.int8_t            # ensures same _integer_ type
-    gbl.std.uint8_t = gbl.uint8_t
-except (AttributeError, TypeError):
-    pass
+if _lazy_std:
+    gbl.std.int8_t  = _lazy_attribute('int8_t',  lambda: gbl.int8_t)
+    gbl.std.uint8_t = _lazy_attribute('uint8_t', lambda: gbl.uint8_t)
+else:
+    try:
+        gbl.std.int8_t  = gbl.int8_t        # ensures same _integer_ type
+        gbl.std.uint8_t = gbl.uint8_t
+    except (AttributeError, TypeError):
+        pass
+_startup.mark('typemap')
 
 
 #- pythonization factories ---------------------------------------------------
@@ -107,24 +162,10 @@ from . import _pythonization as py
 py._set_backend(_backend)
 
 def _standard_pythonizations(pyclass, name):
-  # pythonization of tuple; TODO: placed here for convenience, but a custom case
-  # for tuples on each platform can be made much more performant ...
+  # pythonization of tuple, with accessors generated per instantiation (placed
+  # here for convenience)
     if name.find('tuple<', 0, 6) == 0:
-        import cppyy
-        pyclass._tuple_len = cppyy.gbl.std.tuple_size(pyclass).value
-        def tuple_len(self):
-            return self.__class__._tuple_len
-        pyclass.__len__ = tuple_len
-        def tuple_getitem(self, idx, get=cppyy.gbl.std.get):
-            if idx < self.__class__._tuple_len:
-                res = get[idx](self)
-                try:
-                    res.__life_line = self
-                except Exception:
-                    pass
-                return res
-            raise IndexError(idx)
-        pyclass.__getitem__ = tuple_getitem
+        _add_tuple_accessors(pyclass)
 
   # pythonization of std::string; placed here because it's simpler to write the
   # custom "npos" object (to allow easy result checking of find/rfind) in Python
@@ -137,12 +178,621 @@ def _standard_pythonizations(pyclass, name):
         del pyclass.__class__.npos          # drop b/c is const data
         pyclass.npos = NPOS(pyclass.npos)
 
+  # bulk additions from objects with a buffer of the vector's element type, and
+  # zero-copy numpy views of contiguous containers of numeric types
+    elif name.find('vector<', 0, 7) == 0:
+        if pyclass.__cpp_name__ == 'std::vector<std::string>':
+            _add_vector_string_conversions(pyclass)
+        else:
+            _add_vector_buffer_iadd(pyclass)
+            _add_array_interface(pyclass)
+
+    elif name.find('array<', 0, 6) == 0:
+        _add_array_interface(pyclass)
+
+  # bulk conversions to and from Python dicts
+    elif name.find('map<', 0, 4) == 0 or name.find('unordered_map<', 0, 14) == 0:
+        _add_map_dict_conversions(pyclass)
+
     return True
 
+def _vector_append():
+    try:
+        return gbl._cppyy_internal.vector_append
+    except AttributeError:
+        _declare("""namespace _cppyy_internal {
+        template<typename T>
+        void vector_append(std::vector<T>& v, const T* data, size_t n) {
+            v.insert(v.end(), data, data+n); } }""")
+    return gbl._cppyy_internal.vector_append
+
+_tuple_conversions = False
+def _tuple_accessors(pyclass):
+  # declare non-template accessors for each element of tuple type <pyclass>, as
+  # well as a conversion of the full tuple (appended to a list, if all elements
+  # are builtin types or std::string); returns the accessors, paired with
+  # whether the element is an object (to be given a life line to the tuple),
+  # and the conversion
+    global _tuple_conversions
+    if not _tuple_conversions:
+        _declare_py_conversions()
+        _declare("""#include <tuple>
+        #include <utility>
+        namespace _cppyy_internal {
+        template<typename T>
+        struct py_native : std::integral_constant<bool, std::is_same<T, std::string>::value ||
+            std::is_same<T, bool>::value || std::is_same<T, float>::value || std::is_same<T, double>::value ||
+            (std::is_integral<T>::value && sizeof(T) != 1 && !std::is_same<T, wchar_t>::value &&
+             !std::is_same<T, char16_t>::value && !std::is_same<T, char32_t>::value)> {};
+
+        template<typename T>
+        bool tuple_set_item(PyObject* tup, Py_ssize_t i, const T& value) {
+            PyObject* item = to_py(value);
+            if (!item) return false;
+            PyTuple_SET_ITEM(tup, i, item);
+            return true;
+        }
+
+        template<bool... B>
+        struct all_of : std::true_type {};
+        template<bool B, bool... Bs>
+        struct all_of<B, Bs...> : std::integral_constant<bool, B && all_of<Bs...>::value> {};
+
+        template<typename T, size_t... I>
+        bool tuple_to_py(const T&, PyObject*, std::index_sequence<I...>, std::false_type) {
+            return true;
+        }
+
+        template<typename T, size_t... I>
+        bool tuple_to_py(const T& t, PyObject* out, std::index_sequence<I...>, std::true_type) {
+            PyObject* tup = PyTuple_New(sizeof...(I));
+            if (!tup) return false;
+            bool ok = true;
+            int order[] = {0, ((ok = ok && tuple_set_item(tup, I, std::get<I>(t))), 0)...};
+            (void)order;
+            if (ok) ok = !PyList_Append(out, tup);
+            Py_DECREF(tup);
+            return ok;
+        }
+
+        template<typename T, size_t... I>
+        bool tuple_to_py(const T& t, PyObject* out, std::index_sequence<I...> seq) {
+            return tuple_to_py(t, out, seq,
+                all_of<py_native<typename std::tuple_element<I, T>::type>::value...>{});
+        }
+
+        template<typename T, size_t... I>
+        std::string tuple_kinds(std::index_sequence<I...>) {
+            return std::string{(std::is_class<typename std::remove_reference<
+                typename std::tuple_element<I, T>::type>::type>::value ? 'o' : 'b')...};
+        } }""")
+        _tuple_conversions = True
+
+    n = pyclass._tuple_len
+    nsname = 'tuple_%d' % next(_internal_count)
+    _declare("""namespace _cppyy_internal { namespace %s {
+    using T = %s;
+    %s
+    PyObject* astuple(const T& t, PyObject* out) { return py_result(tuple_to_py(t, out, std::make_index_sequence<%d>{})); }
+    std::string kinds() { return tuple_kinds<T>(std::make_index_sequence<%d>{}); } } }""" % \
+        (nsname, pyclass.__cpp_name__,
+         '\n'.join(['decltype(auto) get%d(T& t) { return std::get<%d>(t); }' % (i, i) for i in range(n)]),
+         n, n))
+    ns = getattr(gbl._cppyy_internal, nsname)
+    kinds = str(ns.kinds())
+    getters = tuple((getattr(ns, 'get%d' % i), kinds[i] == 'o') for i in range(n))
+    return getters, ns.astuple
+
+def _add_tuple_accessors(pyclass):
+    pyclass._tuple_len = gbl.std.tuple_size(pyclass).value
+    def tuple_len(self):
+        return self.__class__._tuple_len
+    pyclass.__len__ = tuple_len
+
+    accessors = list()       # filled on first use, as declaring takes time
+    def tuple_getitem(self, idx):
+        if not accessors:
+            accessors.extend(_tuple_accessors(pyclass))
+        try:
+            get, is_object = accessors[0][idx]
+        except (IndexError, TypeError):
+            raise IndexError(idx)
+        res = get(self)
+        if is_object:
+            try:
+                res.__life_line = self
+            except Exception:
+                pass
+        return res
+    pyclass.__getitem__ = tuple_getitem
+
+    def astuple(self):
+        """Returns a Python tuple with the (converted) elements of this tuple."""
+        if not accessors:
+            accessors.extend(_tuple_accessors(pyclass))
+        out = list()
+        _py_convert(accessors[1], self, out)
+        if not out:          # not all elements are builtin types or std::string
+            return tuple(tuple_getitem(self, i) for i in range(pyclass._tuple_len))
+        return out[0]
+    pyclass.astuple = astuple
+
+  # iteration yields the same as indexing (i.e. no conversion of std::string)
+    def tuple_iter(self):
+        for i in range(pyclass._tuple_len):
+            yield tuple_getitem(self, i)
+    pyclass.__iter__ = tuple_iter
+
+_vector_buffer_formats = dict()
+def _buffer_format(tname):
+    if not _vector_buffer_formats:
+        for fmt, cppname in _backend.Template.buffer_types.items():
+            _vector_buffer_formats[cppname] = fmt
+    return _vector_buffer_formats.get(tname)
+
+def _vector_buffer(obj):
+    if type(obj) in (int, list, tuple):
+        return None
+    try:
+        return memoryview(obj)
+    except TypeError:
+        return None
+
+def _add_vector_buffer_iadd(pyclass):
+    fmt = _buffer_format(getattr(pyclass, 'value_type', None))
+    if fmt is None:
+        return
+
+  # (construction from buffers is already handled in bulk by the constructor;
+  # signed char buffers do not bind to 'const signed char*', so are appended
+  # element-wise)
+    bulk = fmt != 'b' and fmt or None
+    iadd = pyclass.__dict__.get('__iadd__')
+    def vector_iadd(self, ll):
+        buf = _vector_buffer(ll)
+        if buf is not None and buf.ndim == 1 and buf.c_contiguous and buf.format.lstrip('@') == bulk:
+            _vector_append()[pyclass.value_type](self, buf, len(buf))
+        elif buf is not None:
+            for x in ll: self.push_back(x)      # conversions and strides
+        elif iadd is not None:        # bound explicitly, as it need not be a function
+            iadd.__get__(self, pyclass)(ll)
+        else:
+            self.reserve(len(self)+len(ll))
+            for x in ll: self.push_back(x)
+        return self
+    pyclass.__iadd__ = vector_iadd
+
+_array_elements = dict()
+def _array_element(pyclass):
+  # numpy type string, item size, and trailing shape of the element type of
+  # <pyclass>, with std::array elements unrolled; or None if not numeric
+    try:
+        return _array_elements[pyclass]
+    except KeyError:
+        pass
+    elem = None
+    tname = _canonical_name(pyclass.__cpp_name__+'::value_type')
+    fmt = _buffer_format(tname)
+    if fmt is not None:
+        kind = fmt in 'fd' and 'f' or (fmt.islower() and 'i' or 'u')
+        size = struct.calcsize(fmt)
+        elem = ('%s%s%d' % (sys.byteorder == 'little' and '<' or '>', kind, size), size, ())
+    elif tname.find('std::array<', 0, 11) == 0:
+        inner = _array_element(getattr(gbl.std, tname[5:]))
+        if inner is not None:
+            n = sizeof(tname)//inner[1]
+            for dim in inner[2]:
+                n //= dim
+            elem = (inner[0], inner[1], (n,)+inner[2])
+    _array_elements[pyclass] = elem
+    return elem
+
+def _array_interface(self):
+    elem = _array_element(type(self))
+    if elem is None:      # numpy falls back to __array__ (a copy)
+        raise AttributeError("'%s' object has no attribute '__array_interface__'" % type(self).__name__)
+    n = self.size()
+    return {'shape' : (n,)+elem[2], 'typestr' : elem[0], 'version' : 3,
+            'data' : (n and addressof(self.data()) or 0, False)}
+
+# Guarded views keep a vector's original storage alive if it reallocates: each
+# view gets a guard object as its base, which is registered by id of the vector
+# being viewed, and methods that may reallocate check that registry first. The
+# method wrappers are only installed on classes of which guarded views exist.
+_array_guards = dict()
+
+class _ArrayGuard(object):
+    __slots__ = ['vector', 'storage', '__array_interface__', '__weakref__']
+    def __init__(self, vector):
+        self.vector  = vector
+        self.storage = None
+        self.__array_interface__ = vector.__array_interface__
+        try:
+            guards = _array_guards[id(vector)]
+            guards.add(self)
+        except KeyError:
+            _guard_vector_class(type(vector))
+            guards = _array_guards[id(vector)] = weakref.WeakSet((self,))
+        weakref.finalize(self, _drop_guards, id(vector), guards)
+
+def _drop_guards(key, guards):
+  # remove the registry entry of a vector once its last guard is gone (the
+  # dying guard may still be in the set, but no longer dereferences)
+    if _array_guards.get(key) is guards and not any(True for g in guards):
+        del _array_guards[key]
+
+def _detach_views(vector):
+  # hand the viewed storage over to the guards and give the vector a copy
+    guards = _array_guards.pop(id(vector), None)
+    if not guards:
+        return
+    storage = type(vector)()
+    storage.swap(vector)
+    vector.reserve(storage.capacity())
+    if storage.size():
+        _vector_append()[type(vector).value_type](vector, storage.data(), storage.size())
+    for guard in guards:
+        guard.vector  = None
+        guard.storage = storage
+
+def _at_capacity(self, *args):
+    return self.size() == self.capacity()
+
+def _beyond_capacity(self, n, *args):
+    return self.capacity() < n
+
+# (not covered are the template methods emplace and emplace_back, as wrapping
+# breaks their instantiation, and insert, as detaching invalidates iterators)
+_reallocating_methods = {
+    'push_back' : _at_capacity,
+    'resize'    : _beyond_capacity, 'reserve' : _beyond_capacity,
+    'assign' : None, 'swap' : None, 'shrink_to_fit' : None,
+    '__iadd__' : None, '__assign__' : None }
+
+def _guard_vector_class(pyclass):
+    if '_views_guarded' in pyclass.__dict__:
+        return
+    def guarded(mname, orig, reallocates):
+        def method(self, *args):
+            if id(self) in _array_guards and (reallocates is None or reallocates(self, *args)):
+                _detach_views(self)
+            return orig.__get__(self, pyclass)(*args)
+        method.__name__ = mname
+        method.__doc__ = getattr(orig, '__doc__', None)
+        return method
+    for mname, reallocates in _reallocating_methods.items():
+        orig = getattr(pyclass, mname, None)
+        if orig is not None:
+            setattr(pyclass, mname, guarded(mname, orig, reallocates))
+    pyclass._views_guarded = True
+
+# key and mapped types that are converted in bulk in C++; the conversions follow
+# those of cppyy, except that std::string converts to (UTF-8 decoded) str
+_map_native_types = set(['bool', 'short', 'unsigned short', 'int', 'unsigned int',
+    'long', 'unsigned long', 'long long', 'unsigned long long', 'float', 'double',
+    'std::string'])
+
+# conversions between C++ builtin types or std::string and Python objects, for
+# use in bulk conversions of containers in C++
+_py_conversions = False
+def _declare_py_conversions():
+    global _py_conversions
+    if not _py_conversions:
+        _declare("""#include "Python.h"
+        #include <limits>
+        #include <string>
+        #include <type_traits>
+        namespace _cppyy_internal {
+        // (overloads rather than 'if constexpr', as C++14 is supported)
+        template<typename T>
+        using if_float = typename std::enable_if<std::is_floating_point<T>::value, bool>::type;
+        template<typename T>
+        using if_signed = typename std::enable_if<std::is_integral<T>::value && std::is_signed<T>::value, bool>::type;
+        template<typename T>
+        using if_unsigned = typename std::enable_if<std::is_integral<T>::value &&
+            !std::is_signed<T>::value && !std::is_same<T, bool>::value, bool>::type;
+
+        inline PyObject* to_py(const std::string& v) {
+            return PyUnicode_FromStringAndSize(v.data(), (Py_ssize_t)v.size());
+        }
+        inline PyObject* to_py(bool v) { return PyBool_FromLong(v); }
+        template<typename T, if_float<T> = true>
+        PyObject* to_py(const T& v) { return PyFloat_FromDouble(v); }
+        template<typename T, if_signed<T> = true>
+        PyObject* to_py(const T& v) { return PyLong_FromLongLong(v); }
+        template<typename T, if_unsigned<T> = true>
+        PyObject* to_py(const T& v) { return PyLong_FromUnsignedLongLong(v); }
+
+        inline bool from_py(PyObject* o, std::string& v) {
+            const char* s; Py_ssize_t sz;
+            if (PyBytes_Check(o)) {
+                s = PyBytes_AS_STRING(o); sz = PyBytes_GET_SIZE(o);
+            } else if (!PyUnicode_Check(o)) {
+                PyErr_Format(PyExc_TypeError, "expected str or bytes, got %s", Py_TYPE(o)->tp_name);
+                return false;
+            } else if (!(s = PyUnicode_AsUTF8AndSize(o, &sz)))
+                return false;
+            v.assign(s, sz);
+            return true;
+        }
+
+        inline bool from_py(PyObject* o, bool& v) {
+            long l = PyLong_AsLong(o);
+            if (l == -1 && PyErr_Occurred()) return false;
+            if (l != 0 && l != 1) {
+                PyErr_SetString(PyExc_ValueError, "boolean value should be bool, or integer 1 or 0");
+                return false;
+            }
+            v = (bool)l;
+            return true;
+        }
+
+        template<typename T, if_float<T> = true>
+        bool from_py(PyObject* o, T& v) {
+            double d = PyFloat_AsDouble(o);
+            if (d == -1. && PyErr_Occurred()) return false;
+            v = (T)d;
+            return true;
+        }
+
+        template<typename T, if_signed<T> = true>
+        bool from_py(PyObject* o, T& v) {
+            long long l = PyLong_AsLongLong(o);
+            if (l == -1 && PyErr_Occurred()) return false;
+            if (l < (long long)std::numeric_limits<T>::min() || (long long)std::numeric_limits<T>::max() < l) {
+                PyErr_SetString(PyExc_ValueError, "integer out of range");
+                return false;
+            }
+            v = (T)l;
+            return true;
+        }
+
+        template<typename T, if_unsigned<T> = true>
+        bool from_py(PyObject* o, T& v) {
+            unsigned long long l = PyLong_AsUnsignedLongLong(o);
+            if (l == (unsigned long long)-1 && PyErr_Occurred()) return false;
+            if ((unsigned long long)std::numeric_limits<T>::max() < l) {
+                PyErr_SetString(PyExc_ValueError, "integer out of range");
+                return false;
+            }
+            v = (T)l;
+            return true;
+        }
+
+        // entry points return the exception raised in conversion, or None
+        inline PyObject* py_result(bool ok) {
+            PyObject *type = nullptr, *value = nullptr, *tb = nullptr;
+            if (!ok) {
+                PyErr_Fetch(&type, &value, &tb);
+                PyErr_NormalizeException(&type, &value, &tb);
+                Py_XDECREF(type); Py_XDECREF(tb);
+            }
+            if (!value) Py_RETURN_NONE;
+            return value;
+        } }""")
+        _py_conversions = True
+
+def _py_convert(convert, *args):
+    err = convert(*args)
+    if err is not None:
+        raise err
+
+_map_converters = None
+def _map_dict_converters():
+    global _map_converters
+    if _map_converters is None:
+        _declare_py_conversions()
+        _declare("""namespace _cppyy_internal {
+        template<typename M>
+        auto map_reserve(M& m, size_t n, int) -> decltype(m.reserve(n), void()) { m.reserve(n); }
+        template<typename M>
+        void map_reserve(M&, size_t, long) {}
+
+        template<typename M>
+        bool fill_dict(const M& m, PyObject* d) {
+            for (const auto& p : m) {
+                PyObject* key = to_py(p.first);
+                if (!key) return false;
+                PyObject* value = to_py(p.second);
+                if (!value) { Py_DECREF(key); return false; }
+                int res = PyDict_SetItem(d, key, value);
+                Py_DECREF(value); Py_DECREF(key);
+                if (res) return false;
+            }
+            return true;
+        }
+
+        template<typename M>
+        bool fill_map(M& m, PyObject* d) {
+            map_reserve(m, m.size()+PyDict_Size(d), 0);
+            PyObject *key, *value; Py_ssize_t pos = 0;
+            typename M::key_type k; typename M::mapped_type v;
+            while (PyDict_Next(d, &pos, &key, &value)) {
+                if (!from_py(key, k) || !from_py(value, v))
+                    return false;
+                m[k] = v;
+            }
+            return true;
+        }
+
+        template<typename M>
+        PyObject* map_to_dict(const M& m, PyObject* d) { return py_result(fill_dict(m, d)); }
+        template<typename M>
+        PyObject* map_from_dict(M& m, PyObject* d) { return py_result(fill_map(m, d)); } }""")
+        _map_converters = (gbl._cppyy_internal.map_to_dict, gbl._cppyy_internal.map_from_dict)
+    return _map_converters
+
+def _add_map_dict_conversions(pyclass):
+    native = None
+    def is_native():
+        nonlocal native
+        if native is None:
+            native = all(_canonical_name(pyclass.__cpp_name__+'::'+t) in _map_native_types
+                         for t in ('key_type', 'mapped_type'))
+        return native
+
+    def to_dict(self):
+        """Returns a dict with the (converted) elements of this map."""
+        if not is_native():
+            return dict((p.first, p.second) for p in self)
+        d = dict()
+        _py_convert(_map_dict_converters()[0][pyclass], self, d)
+        return d
+    pyclass.to_dict = to_dict
+
+    def from_dict(cls, d):
+        """Returns a new map filled with the (converted) elements of dict <d>."""
+        m = cls()
+        if is_native() and type(d) is dict and d:
+            try:
+                _py_convert(_map_dict_converters()[1][cls], m, d)
+                return m
+            except TypeError:
+              # elements not handled by the bulk conversion (e.g. bound C++
+              # objects) are converted one by one
+                m.clear()
+        for key, value in d.items():
+            m[key] = value
+        return m
+    pyclass.from_dict = classmethod(from_dict)
+
+_string_converters = None
+def _vector_string_converters():
+    global _string_converters
+    if _string_converters is None:
+        _declare_py_conversions()
+        _declare("""#include <cstring>
+        #include <vector>
+        namespace _cppyy_internal {
+        bool fill_list(const std::vector<std::string>& v, PyObject* l, const char* errors) {
+            Py_ssize_t i = 0;
+            for (const auto& s : v) {
+                PyObject* pys = PyUnicode_DecodeUTF8(s.data(), (Py_ssize_t)s.size(), errors);
+                if (!pys || PyList_SetItem(l, i++, pys)) return false;
+            }
+            return true;
+        }
+
+        bool fill_strings(std::vector<std::string>& v, PyObject* seq) {
+            PyObject* fast = PySequence_Fast(seq, "expected a sequence of str or bytes");
+            if (!fast) return false;
+            Py_ssize_t n = PySequence_Fast_GET_SIZE(fast);
+            PyObject** items = PySequence_Fast_ITEMS(fast);
+            size_t size0 = v.size();
+            v.reserve(size0+n);
+            std::string s;
+            for (Py_ssize_t i = 0; i < n; ++i) {
+                if (!from_py(items[i], s)) { v.resize(size0); Py_DECREF(fast); return false; }
+                v.push_back(s);
+            }
+            Py_DECREF(fast);
+            return true;
+        }
+
+        bool fill_buffers(const std::vector<std::string>& v, PyObject* out) {
+            size_t total = 0;
+            for (const auto& s : v) total += s.size();
+            PyObject* offsets = PyBytes_FromStringAndSize(nullptr, (Py_ssize_t)((v.size()+1)*sizeof(long long)));
+            if (!offsets) return false;
+            PyObject* data = PyBytes_FromStringAndSize(nullptr, (Py_ssize_t)total);
+            if (!data) { Py_DECREF(offsets); return false; }
+            long long* off = (long long*)PyBytes_AS_STRING(offsets);
+            char* buf = PyBytes_AS_STRING(data);
+            long long pos = 0; off[0] = 0;
+            for (size_t i = 0; i < v.size(); ++i) {
+                memcpy(buf+pos, v[i].data(), v[i].size());
+                pos += v[i].size(); off[i+1] = pos;
+            }
+            int res = PyList_Append(out, offsets) || PyList_Append(out, data);
+            Py_DECREF(data); Py_DECREF(offsets);
+            return !res;
+        }
+
+        PyObject* strings_to_list(const std::vector<std::string>& v, PyObject* l, const char* errors) {
+            return py_result(fill_list(v, l, errors));
+        }
+        PyObject* strings_from_seq(std::vector<std::string>& v, PyObject* seq) {
+            return py_result(fill_strings(v, seq));
+        }
+        PyObject* strings_to_buffers(const std::vector<std::string>& v, PyObject* out) {
+            return py_result(fill_buffers(v, out));
+        } }""")
+        ns = gbl._cppyy_internal
+        _string_converters = (ns.strings_to_list, ns.strings_from_seq, ns.strings_to_buffers)
+    return _string_converters
+
+def _add_vector_string_conversions(pyclass):
+  # construction from, and extension with, lists and tuples of str or bytes; for
+  # other elements (e.g. bound std::string objects), the bulk conversion leaves
+  # the vector as-is and raises TypeError, and elements are added one by one
+    init = pyclass.__init__
+    def vector_string_init(self, *args):
+        if len(args) == 1 and type(args[0]) in (list, tuple):
+            init.__get__(self, pyclass)()
+            try:
+                _py_convert(_vector_string_converters()[1], self, args[0])
+            except TypeError:
+                for x in args[0]: self.push_back(x)
+        else:
+            init.__get__(self, pyclass)(*args)
+    pyclass.__init__ = vector_string_init
+
+    iadd = pyclass.__dict__.get('__iadd__')
+    def vector_string_iadd(self, ll):
+        if type(ll) in (list, tuple):
+            try:
+                _py_convert(_vector_string_converters()[1], self, ll)
+                return self
+            except TypeError:
+                pass
+        if iadd is not None:          # bound explicitly, as it need not be a function
+            iadd.__get__(self, pyclass)(ll)
+        else:
+            for x in ll: self.push_back(x)
+        return self
+    pyclass.__iadd__ = vector_string_iadd
+
+    def tolist(self, errors='strict'):
+        """Returns a list of str with the UTF-8 decoded strings of this vector,
+        using error handler <errors> (as for bytes.decode()).
+        """
+        l = [None]*len(self)
+        _py_convert(_vector_string_converters()[0], self, l, errors)
+        return l
+    pyclass.tolist = tolist
+
+    def to_buffers(self):
+        """Returns the strings of this vector as Arrow-style (large string)
+        buffers: a memoryview of len(self)+1 int64 offsets and a bytes object
+        with the concatenated data.
+        """
+        out = list()
+        _py_convert(_vector_string_converters()[2], self, out)
+        return memoryview(out[0]).cast('q'), out[1]
+    pyclass.to_buffers = to_buffers
+
+def _add_array_interface(pyclass):
+    resizable = hasattr(pyclass, 'capacity')
+    def as_numpy(self, guard=False):
+        """Returns a numpy array viewing the data of this container, which is
+        kept alive by the array. The array is invalidated if the container
+        reallocates, unless <guard> is True, in which case the original storage
+        is kept alive and the array no longer follows the container.
+        """
+        import numpy
+        if _array_element(type(self)) is None:
+            raise TypeError('no numpy equivalent of the element type of %s' % type(self).__cpp_name__)
+        if guard and resizable:
+            return numpy.asarray(_ArrayGuard(self))
+        return numpy.asarray(self)
+    pyclass.__array_interface__ = property(_array_interface)
+    pyclass.as_numpy = as_numpy
+
 if not ispypy:
     py.add_pythonization(_standard_pythonizations, "std")
 # TODO: PyPy still has the old-style pythonizations, which require the full
 # class name (not possible for std::tuple ...)
+_startup.mark('pythonizations')
 
 # std::make_shared/unique create needless templates: rely on Python's introspection
 # instead. This also allows Python derived classes to be handled correctly.
@@ -175,39 +825,186 @@ class make_smartptr(object):
             return py_make_smartptr(getattr(gbl, cls), self.ptrcls)
         return self.maker[cls]
 
-gbl.std.make_shared = make_smartptr(gbl.std.shared_ptr, gbl.std.make_shared)
-gbl.std.make_unique = make_smartptr(gbl.std.unique_ptr, gbl.std.make_unique)
-del make_smartptr
+if _lazy_std:
+    gbl.std.make_shared = _lazy_attribute('make_shared',
+        lambda mk=make_smartptr: mk(gbl.std.shared_ptr, gbl.std.make_shared))
+    gbl.std.make_unique = _lazy_attribute('make_unique',
+        lambda mk=make_smartptr: mk(gbl.std.unique_ptr, gbl.std.make_unique))
+else:
+    gbl.std.make_shared = make_smartptr(gbl.std.shared_ptr, gbl.std.make_shared)
+    gbl.std.make_unique = make_smartptr(gbl.std.unique_ptr, gbl.std.make_unique)
+del make_smartptr, _lazy_std
+_startup.mark('smartptr')
 
 
 #--- interface to Cling ------------------------------------------------------
+_interp_lock = threading.RLock()     # serializes Cling access across threads
+_internal_count = itertools.count()  # for unique names in _cppyy_internal
+_capture_stderr = True
+
 class _stderr_capture(object):
-    def __init__(self):
-       self._capture = not gbl.CppyyLegacy.gDebug and True or False
+    def __init__(self, force=False):
+       self._capture = force or (_capture_stderr and not gbl.CppyyLegacy.gDebug) and True or False
        self.err = ""
 
     def __enter__(self):
+      # stderr is redirected process-wide, so lock out other threads
+        _interp_lock.acquire()
         if self._capture:
            _begin_capture_stderr()
         return self
 
     def __exit__(self, tp, val, trace):
-        if self._capture:
-            self.err = _end_capture_stderr()
+        try:
+            if self._capture:
+                self.err = _end_capture_stderr()
+        finally:
+            _interp_lock.release()
+
+_transaction = threading.local()
+
+# on the background thread of cppdef_async() and include_async(), Cling runs
+# with the GIL released (but holding the interpreter lock), for other Python
+# threads, such as an asyncio loop, to proceed in the meantime
+_nogil = threading.local()
+_declare_nogil = None
+
+def _interp_declare(src):
+    global _declare_nogil
+    if not getattr(_nogil, 'active', False):
+        return gbl.gInterpreter.Declare(src)
+    if _declare_nogil is None:
+        gbl.gInterpreter.Declare("""namespace _cppyy_internal {
+        bool declare_nogil(const char* src) { return gInterpreter->Declare(src); } }""")
+        _declare_nogil = gbl._cppyy_internal.declare_nogil
+        _declare_nogil.__release_gil__ = True
+    return _declare_nogil(src)
 
 def cppdef(src):
     """Declare C++ source <src> to Cling."""
+    pending = getattr(_transaction, 'pending', None)
+    if pending is not None:
+        pending.append(src)         # deferred until the end of the transaction
+        return True
+
+    with _interp_lock:
+        if _cppdef_cache is not None:
+            incpath = gbl.gInterpreter.GetIncludePath()
+            key = _cppdef_cache.key(src, incpath)
+            if _cppdef_cache.lookup(key):
+                return True         # already declared through the PCH
+
+        try:
+            _declare(src)
+        except SyntaxError as e:
+          # an edited source may conflict with its previous version in the PCH
+            if _cppdef_cache is not None and _cppdef_cache.invalidate(str(e)):
+                raise SyntaxError('%s\nConflicting definitions were dropped from the cppdef '
+                                  'cache; the new ones take effect on the next start' % str(e))
+            raise
+
+        if _cppdef_cache is not None:
+            _cppdef_cache.record(key, src, incpath, origin=_caller_file())
+    return True
+
+def _caller_file():
+  # name of the file that called into cppyy, to detect edits of cached sources
+    frame = sys._getframe(1)
+    pkgdir = os.path.dirname(__file__)+os.sep
+    while frame is not None and frame.f_code.co_filename.startswith(pkgdir):
+        frame = frame.f_back
+    return frame is not None and frame.f_code.co_filename or None
+
+def _declare(src):
+  # as cppdef, but never deferred or cached, for internal declarations that
+  # are immediately used and/or have names that are unique to the process
     with _stderr_capture() as err:
-        errcode = gbl.gInterpreter.Declare(src)
+        errcode = _interp_declare(src)
     if not errcode or err.err:
         if 'warning' in err.err.lower() and not 'error' in err.err.lower():
             warnings.warn(err.err, SyntaxWarning)
-            return True
-        raise SyntaxError('Failed to parse the given C++ code%s' % err.err)
+        else:
+            raise SyntaxError('Failed to parse the given C++ code%s' % err.err)
     return True
 
-def cppexec(stmt):
-    """Execute C++ statement <stmt> in Cling's global scope."""
+def cppdef_many(snippets):
+    """Declare all C++ sources in <snippets> to Cling in one go. On error, none
+    are declared and the raised SyntaxError lists the failing snippets (by
+    index) in its 'snippets' attribute; diagnostics refer to 'cppdef_many[i]'."""
+    return _declare_many(snippets, cppdef)
+
+def _declare_many(snippets, declare):
+    src = '\n'.join('#line 1 "cppdef_many[%d]"\n%s' % (i, snippet) for i, snippet in enumerate(snippets))
+    if not src:
+        return True
+    try:
+        return declare(src)
+    except SyntaxError as e:
+        err = str(e)
+        failed = sorted(set(int(i) for i in re.findall(r'cppdef_many\[(\d+)\]:\d+:\d+: (?:fatal )?error', err)))
+        pos = err.find('\n')
+        exc = SyntaxError('Failed to parse the given C++ code (snippets: %s)%s' % \
+            (', '.join(map(str, failed)), 0 <= pos and err[pos:] or ''))
+        exc.snippets = failed
+        raise exc
+
+class transaction(object):
+    """Context in which cppdef calls are collected and declared to Cling in one
+    go with cppdef_many on exit (thus the declarations are not usable until
+    then). If the context exits with an exception, nothing is declared."""
+    def __enter__(self):
+        self._outer = getattr(_transaction, 'pending', None)
+        if self._outer is None:
+            _transaction.pending = list()
+        return self
+
+    def __exit__(self, tp, val, trace):
+        if self._outer is not None:
+            return                  # nested: outer transaction declares
+        pending, _transaction.pending = _transaction.pending, None
+        if tp is None:
+            cppdef_many(pending)
+
+_cppexec_wrappers = collections.OrderedDict()
+_cppexec_maxsize  = 256
+
+def _cppexec_wrap(stmt):
+  # only expressions are wrapped: other statements (declarations in particular)
+  # have different semantics inside a function than in the global scope
+    expr = stmt.strip().rstrip(';')
+    if not expr or ';' in expr or expr[0] == '#':
+        return None
+    name = 'cppexec_%d' % next(_internal_count)
+    with _stderr_capture(force=True):       # failure to wrap is not an error
+        ok = gbl.gInterpreter.Declare(
+            "namespace _cppyy_internal { decltype(auto) %s() { return %s; } }" % (name, expr))
+    if not ok:
+        return None
+    return getattr(gbl._cppyy_internal, name)
+
+def cppexec(stmt, value=False):
+    """Execute C++ statement <stmt> in Cling's global scope and return True. If
+    <stmt> is an expression, it is compiled once into a function, and if <value>
+    is True, its value is returned instead (True if void); other statements are
+    processed every time."""
+    with _interp_lock:
+        return _cppexec(stmt, value)
+
+def _cppexec(stmt, value):
+    try:
+        wrapper = _cppexec_wrappers[stmt]
+        _cppexec_wrappers.move_to_end(stmt)
+    except KeyError:
+        wrapper = _cppexec_wrappers[stmt] = _cppexec_wrap(stmt)
+        if _cppexec_maxsize < len(_cppexec_wrappers):
+            _cppexec_wrappers.popitem(last=False)
+
+    if wrapper is not None:
+        result = wrapper()
+        if not value or result is None:
+            return True
+        return result
+
     if stmt and stmt[-1] != ';':
         stmt += ';'
 
@@ -228,18 +1025,70 @@ def cppexec(stmt):
 
     return True
 
+def _declare_bulk(snippets, head='', tail='', declare=_declare):
+    """Declare <snippets>, enclosed by <head> and <tail>, in one go. Snippets that
+    fail to compile are left out. Returns the indices of the declared ones."""
+
+  # a failed declaration declares nothing, so retry without the failed snippets
+    todo = list(range(len(snippets)))
+    while todo:
+        try:
+            _declare_many([head] + [snippets[i] for i in todo] + [tail], declare)
+            break
+        except SyntaxError as e:
+            bad = set(todo[i-1] for i in e.snippets if 0 < i <= len(todo)) or set(todo)
+            todo = [i for i in todo if not i in bad]
+    return todo
+
+_macro_values = dict()
+
 def macro(cppm):
     """Attempt to evalute a C/C++ pre-processor macro as a constant"""
 
+    try:
+        return _macro_values[cppm]
+    except KeyError:
+        pass
+
     try:
         macro_val = getattr(getattr(gbl, '__cppyy_macros', None), cppm+'_', None)
         if macro_val is None:
             cppdef("namespace __cppyy_macros { auto %s_ = %s; }" % (cppm, cppm))
-        return getattr(getattr(gbl, '__cppyy_macros'), cppm+'_')
+        macro_val = _macro_values[cppm] = getattr(getattr(gbl, '__cppyy_macros'), cppm+'_')
+        return macro_val
     except Exception:
         pass
 
-    raise ValueError('Failed to evaluate macro %s', cppm)
+    raise ValueError('Failed to evaluate macro %s' % cppm)
+
+def macros(cppms):
+    """Evaluate all C/C++ pre-processor macros in <cppms> as constants, in one
+    declaration. Returns a dict of macro name to value, or to the ValueError
+    describing the failure, for each macro."""
+
+    result, todo = dict(), list()
+    for cppm in cppms:
+        try:
+            result[cppm] = _macro_values[cppm]
+        except KeyError:
+            if not cppm in todo:
+                todo.append(cppm)
+
+  # failed macros are evaluated one by one instead, for individual error reporting
+    ok = _declare_bulk(["namespace __cppyy_macros { auto %s_ = %s; }" % (cppm, cppm) for cppm in todo])
+    if ok:
+        ns = getattr(gbl, '__cppyy_macros')
+        for i in ok:
+            result[todo[i]] = _macro_values[todo[i]] = getattr(ns, todo[i]+'_')
+
+    ok = set(ok)
+    for cppm in [todo[i] for i in range(len(todo)) if not i in ok]:
+        try:
+            result[cppm] = macro(cppm)
+        except ValueError as e:
+            result[cppm] = e
+
+    return result
 
 
 def load_library(name):
@@ -259,126 +1108,261 @@ def load_library(name):
         raise RuntimeError('Unable to load library "%s"%s' % (name, err.err))
     return True
 
+class _IncludeCache(object):
+    """Record of included headers, to skip repeated includes of the same file.
+    Headers are keyed on their resolved path and modification time, or, if not
+    found on the include paths (e.g. system headers), on name and include path.
+    """
+    def __init__(self):
+        self._seen     = set()
+        self._resolved = dict()
+        self.hits      = 0
+        self.misses    = 0
+
+    def _resolve(self, where):
+        header, incpath, cwd = where
+        for p in [cwd] + re.findall(r'-I"([^"]*)"', incpath):
+            fname = os.path.join(p, header)
+            if os.path.isfile(fname):
+                return os.path.realpath(fname)
+        return None
+
+    def key(self, kind, header):
+        incpath = gbl.gInterpreter.GetIncludePath()
+        where = (header, incpath, os.getcwd())
+        try:
+            fname = self._resolved[where]
+        except KeyError:
+            fname = self._resolved[where] = self._resolve(where)
+        if fname is not None:
+            try:
+                return (kind, fname, os.stat(fname).st_mtime)
+            except OSError:
+                del self._resolved[where]
+        return (kind, header, incpath)
+
+    def lookup(self, key):
+        if key in self._seen:
+            self.hits += 1
+            return True
+        self.misses += 1
+        return False
+
+    def record(self, key):
+        self._seen.add(key)
+
+_include_cache = _IncludeCache()
+
+def _include(kind, header, src):
+    with _interp_lock:
+        key = _include_cache.key(kind, header)
+        if _include_cache.lookup(key):
+            return True             # already included
+        if _cppdef_cache is not None:
+          # cached by resolved name, for the PCH to replay it in declaration order
+            incpath = gbl.gInterpreter.GetIncludePath()
+            cached = src.replace('"%s"' % header, '"%s"' % key[1])
+            ckey = _cppdef_cache.key(cached, incpath)
+            if _cppdef_cache.lookup(ckey):
+                _include_cache.record(key)
+                return True         # already included through the PCH
+        with _stderr_capture() as err:
+            errcode = _interp_declare(src)
+        if not errcode:
+            raise ImportError('Failed to load header file "%s"%s' % (header, err.err))
+        _include_cache.record(key)
+        if _cppdef_cache is not None:
+            _cppdef_cache.record(ckey, cached, incpath, header=key[1])
+        return True
+
 def include(header):
     """Load (and JIT) header file <header> into Cling."""
-    with _stderr_capture() as err:
-        errcode = gbl.gInterpreter.Declare('#include "%s"' % header)
-    if not errcode:
-        raise ImportError('Failed to load header file "%s"%s' % (header, err.err))
-    return True
+    return _include('c++', header, '#include "%s"' % header)
 
 def c_include(header):
     """Load (and JIT) header file <header> into Cling."""
-    with _stderr_capture() as err:
-        errcode = gbl.gInterpreter.Declare("""extern "C" {
+    return _include('c', header, """extern "C" {
 #include "%s"
 }""" % header)
-    if not errcode:
-        raise ImportError('Failed to load header file "%s"%s' % (header, err.err))
-    return True
+
+def include_stats():
+    """Returns the number of hits and misses of the cache of included headers."""
+    return {'hits' : _include_cache.hits, 'misses' : _include_cache.misses}
+
+_executor = None
+def _interp_executor():
+    global _executor
+    with _interp_lock:
+        if _executor is None:
+            import concurrent.futures
+            _executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix='cppyy-interp')
+    return _executor
+
+def _run_nogil(f, arg):
+    _nogil.active = True
+    return f(arg)
+
+def cppdef_async(src):
+    """Queue C++ source <src> for declaration to Cling on a background thread.
+    Returns a concurrent.futures.Future with the result of cppdef(src)."""
+    return _interp_executor().submit(_run_nogil, cppdef, src)
+
+def include_async(header):
+    """Queue header file <header> for loading into Cling on a background thread.
+    Returns a concurrent.futures.Future with the result of include(header)."""
+    return _interp_executor().submit(_run_nogil, include, header)
 
 def add_include_path(path):
     """Add a path to the include paths available to Cling."""
     if not os.path.isdir(path):
         raise OSError('No such directory: %s' % path)
-    gbl.gInterpreter.AddIncludePath(path)
+    with _interp_lock:
+        gbl.gInterpreter.AddIncludePath(path)
 
 def add_library_path(path):
     """Add a path to the library search paths available to Cling."""
     if not os.path.isdir(path):
         raise OSError('No such directory: %s' % path)
-    gbl.gSystem.AddDynamicPath(path)
-
-# add access to Python C-API headers
-apipath = sysconfig.get_path('include', 'posix_prefix' if os.name == 'posix' else os.name)
-if os.path.exists(apipath):
-    add_include_path(apipath)
-elif ispypy:
-  # possibly structured without 'pythonx.y' in path
-    apipath = os.path.dirname(apipath)
-    if os.path.exists(apipath) and os.path.exists(os.path.join(apipath, 'Python.h')):
-        add_include_path(apipath)
-
-# add access to extra headers for dispatcher (CPyCppyy only (?))
-if not ispypy:
-    try:
-        apipath_extra = os.environ['CPPYY_API_PATH']
-        if os.path.basename(apipath_extra) == 'CPyCppyy':
-            apipath_extra = os.path.dirname(apipath_extra)
-    except KeyError:
-        apipath_extra = None
-
-    if apipath_extra is None:
+    with _interp_lock:
+        gbl.gSystem.AddDynamicPath(path)
+
+def build_pch(pchname, headers, include_paths=[]):
+    """Build precompiled header <pchname> of <headers> on top of the standard
+    ones; select it for use on startup by setting the CPPYY_PCH envar."""
+    for path in include_paths:
+        if not os.path.isdir(path):
+            raise OSError('No such directory: %s' % path)
+    return _pch.build(pchname, headers, include_paths)
+
+# include paths of the user-level PCH, to locate its headers on #include
+if _user_pch is not None:
+    def _add_pch_paths(meta):
+        for path in meta['include_paths']:
+            if os.path.isdir(path): add_include_path(path)
+      # the headers in the PCH count as included, as they need not be guarded
+        for header in meta['user_headers']:
+            fname = _pch._find_header(header, meta['include_paths'])
+            if fname is not None:
+                fname = os.path.realpath(fname)
+                _include_cache.record(('c++', fname, os.stat(fname).st_mtime))
+    _add_pch_paths(_user_pch[1]); del _add_pch_paths
+
+_startup.mark('interface')
+
+def _find_default_include_paths():
+    paths, warning = [], None
+
+  # add access to Python C-API headers
+    apipath = sysconfig.get_path('include', 'posix_prefix' if os.name == 'posix' else os.name)
+    if os.path.exists(apipath):
+        paths.append(apipath)
+    elif ispypy:
+      # possibly structured without 'pythonx.y' in path
+        apipath = os.path.dirname(apipath)
+        if os.path.exists(apipath) and os.path.exists(os.path.join(apipath, 'Python.h')):
+            paths.append(apipath)
+
+  # add access to extra headers for dispatcher (CPyCppyy only (?))
+    if not ispypy:
         try:
-            import pkg_resources as pr
-
-            d = pr.get_distribution('CPyCppyy')
-            for line in d.get_metadata_lines('RECORD'):
-                if 'API.h' in line:
-                    part = line[0:line.find(',')]
-
-            ape = os.path.join(d.location, part)
-            if os.path.exists(ape):
-                apipath_extra = os.path.dirname(os.path.dirname(ape))
-
-            del part, d, pr
-        except Exception:
-            pass
-
-    if apipath_extra is None:
-        ldversion = sysconfig.get_config_var('LDVERSION')
-        if not ldversion: ldversion = sys.version[:3]
-
-        apipath_extra = os.path.join(os.path.dirname(apipath), 'site', 'python'+ldversion)
-        if not os.path.exists(os.path.join(apipath_extra, 'CPyCppyy')):
-            import glob, libcppyy
-            ape = os.path.dirname(libcppyy.__file__)
-          # a "normal" structure finds the include directory up to 3 levels up,
-          # ie. dropping lib/pythonx.y[md]/site-packages
-            for i in range(3):
-                if os.path.exists(os.path.join(ape, 'include')):
-                    break
-                ape = os.path.dirname(ape)
-
-            ape = os.path.join(ape, 'include')
-            if os.path.exists(os.path.join(ape, 'CPyCppyy')):
-                apipath_extra = ape
-            else:
-              # add back pythonx.y or site/pythonx.y if present
-                for p in glob.glob(os.path.join(ape, 'python'+sys.version[:3]+'*'))+\
-                         glob.glob(os.path.join(ape, '*', 'python'+sys.version[:3]+'*')):
-                    if os.path.exists(os.path.join(p, 'CPyCppyy')):
-                        apipath_extra = p
+            apipath_extra = os.environ['CPPYY_API_PATH']
+            if os.path.basename(apipath_extra) == 'CPyCppyy':
+                apipath_extra = os.path.dirname(apipath_extra)
+        except KeyError:
+            apipath_extra = None
+
+        if apipath_extra is None:
+            try:
+              # importlib.metadata is much cheaper to import than pkg_resources
+                try:
+                    import importlib.metadata as md
+                    d = md.distribution('CPyCppyy')
+                    for f in d.files:
+                        if 'API.h' in str(f):
+                            ape = str(f.locate())
+                except ImportError:
+                    import pkg_resources as pr
+                    d = pr.get_distribution('CPyCppyy')
+                    for line in d.get_metadata_lines('RECORD'):
+                        if 'API.h' in line:
+                            part = line[0:line.find(',')]
+                    ape = os.path.join(d.location, part)
+
+                if os.path.exists(ape):
+                    apipath_extra = os.path.dirname(os.path.dirname(ape))
+            except Exception:
+                pass
+
+        if apipath_extra is None:
+            ldversion = sysconfig.get_config_var('LDVERSION')
+            if not ldversion: ldversion = sys.version[:3]
+
+            apipath_extra = os.path.join(os.path.dirname(apipath), 'site', 'python'+ldversion)
+            if not os.path.exists(os.path.join(apipath_extra, 'CPyCppyy')):
+                import glob, libcppyy
+                ape = os.path.dirname(libcppyy.__file__)
+              # a "normal" structure finds the include directory up to 3 levels up,
+              # ie. dropping lib/pythonx.y[md]/site-packages
+                for i in range(3):
+                    if os.path.exists(os.path.join(ape, 'include')):
                         break
-
-    if apipath_extra.lower() != 'none':
-        if not os.path.exists(os.path.join(apipath_extra, 'CPyCppyy')):
-            warnings.warn("CPyCppyy API not found (tried: %s); set CPPYY_API_PATH envar to the 'CPyCppyy' API directory to fix" % apipath_extra)
-        else:
-            add_include_path(apipath_extra)
-
-    del apipath_extra
-
-if os.getenv('CONDA_PREFIX'):
-  # MacOS, Linux
-    include_path = os.path.join(os.getenv('CONDA_PREFIX'), 'include')
-    if os.path.exists(include_path): add_include_path(include_path)
-
-  # Windows
-    include_path = os.path.join(os.getenv('CONDA_PREFIX'), 'Library', 'include')
-    if os.path.exists(include_path): add_include_path(include_path)
-
-# assuming that we are in PREFIX/lib/python/site-packages/cppyy, add PREFIX/include to the search path
-include_path = os.path.abspath(os.path.join(os.path.dirname(__file__), *(4*[os.path.pardir]+['include'])))
-if os.path.exists(include_path): add_include_path(include_path)
-
-del include_path, apipath, ispypy
+                    ape = os.path.dirname(ape)
+
+                ape = os.path.join(ape, 'include')
+                if os.path.exists(os.path.join(ape, 'CPyCppyy')):
+                    apipath_extra = ape
+                else:
+                  # add back pythonx.y or site/pythonx.y if present
+                    for p in glob.glob(os.path.join(ape, 'python'+sys.version[:3]+'*'))+\
+                             glob.glob(os.path.join(ape, '*', 'python'+sys.version[:3]+'*')):
+                        if os.path.exists(os.path.join(p, 'CPyCppyy')):
+                            apipath_extra = p
+                            break
+
+        if apipath_extra.lower() != 'none':
+            if not os.path.exists(os.path.join(apipath_extra, 'CPyCppyy')):
+                warning = "CPyCppyy API not found (tried: %s); set CPPYY_API_PATH envar to the 'CPyCppyy' API directory to fix" % apipath_extra
+            else:
+                paths.append(apipath_extra)
+
+    if os.getenv('CONDA_PREFIX'):
+      # MacOS, Linux
+        include_path = os.path.join(os.getenv('CONDA_PREFIX'), 'include')
+        if os.path.exists(include_path): paths.append(include_path)
+
+      # Windows
+        include_path = os.path.join(os.getenv('CONDA_PREFIX'), 'Library', 'include')
+        if os.path.exists(include_path): paths.append(include_path)
+
+  # assuming that we are in PREFIX/lib/python/site-packages/cppyy, add PREFIX/include to the search path
+    include_path = os.path.abspath(os.path.join(os.path.dirname(__file__), *(4*[os.path.pardir]+['include'])))
+    if os.path.exists(include_path): paths.append(include_path)
+
+    return {'paths' : paths, 'warning' : warning}
+
+# discovery is cached across processes, as it requires (slow) scans of package
+# metadata and the file system
+from . import _envcache
+def _add_default_include_paths():
+    default_paths = _envcache.cache.get('include_paths', _find_default_include_paths,
+                                        [getattr(_backend, '__file__', '')])
+    for path in default_paths['paths']:
+        add_include_path(path)
+    if default_paths['warning']:
+        warnings.warn(default_paths['warning'])
+    _envcache.cache.save()
+_add_default_include_paths()
+
+del _add_default_include_paths, _find_default_include_paths, ispypy
+_startup.mark('include_paths')
 
 def add_autoload_map(fname):
     """Add the entries from a autoload (.rootmap) file to Cling."""
     if not os.path.isfile(fname):
         raise OSError("no such file: %s" % fname)
-    gbl.gInterpreter.LoadLibraryMap(fname)
+    with _interp_lock:
+        gbl.gInterpreter.LoadLibraryMap(fname)
 
 def set_debug(enable=True):
     """Enable/disable debug output."""
@@ -387,6 +1371,12 @@ def set_debug(enable=True):
     else:
         gbl.CppyyLegacy.gDebug =  0
 
+def set_stderr_capture(enable=True):
+    """Enable/disable the capture of C++ diagnostics from stderr for use in
+    Python exceptions and warnings. If disabled, diagnostics go to stderr."""
+    global _capture_stderr
+    _capture_stderr = enable and True or False
+
 def _get_name(tt):
     if type(tt) == str:
         return tt
@@ -396,36 +1386,159 @@ def _get_name(tt):
         ttname = tt.__name__
     return ttname
 
+def _canonical_name(tt):
+  # resolve typedefs and normalize whitespace, for use as a cache key
+    name = ' '.join(_get_name(tt).split())
+    return str(gbl.CppyyLegacy.TClassEdit.ResolveTypedef(name, True))
+
+def _as_type(tt):
+    if not isinstance(tt, type) and not type(tt) == str:
+        return type(tt)
+    return tt
+
 _sizes = {}
 def sizeof(tt):
     """Returns the storage size (in chars) of C++ type <tt>."""
-    if not isinstance(tt, type) and not type(tt) == str:
-        tt = type(tt)
+    tt = _as_type(tt)
     try:
         return _sizes[tt]
     except KeyError:
+        return sizeof_many([tt])[0]
+
+def sizeof_many(tts):
+    """Returns a list of the storage sizes (in chars) of the C++ types in <tts>,
+    determining those of all types not seen before in one declaration."""
+    tts = [_as_type(tt) for tt in tts]
+
+    todo = dict()                   # canonical name -> types
+    for tt in tts:
+        if tt in _sizes:
+            continue
         try:
-            sz = ctypes.sizeof(tt)
+            _sizes[tt] = ctypes.sizeof(tt)
+            continue
         except TypeError:
-            sz = gbl.gInterpreter.ProcessLine("sizeof(%s);" % (_get_name(tt),))
-        _sizes[tt] = sz
-        return sz
+            pass
+        name = _canonical_name(tt)
+        if name in _sizes:
+            _sizes[tt] = _sizes[name]
+        else:
+            todo.setdefault(name, list()).append(tt)
+
+    if todo:
+        names = list(todo)
+        arrname = 'sizes_%d' % next(_internal_count)
+        ok = _declare_bulk(['sizeof(%s),' % name for name in names],
+            'namespace _cppyy_internal { const size_t %s[] = {' % arrname, '}; }')
+        if ok:
+            sizes = getattr(gbl._cppyy_internal, arrname)
+            for i, idx in enumerate(ok):
+                sz = _sizes[names[idx]] = int(sizes[i])
+                for tt in todo[names[idx]]:
+                    _sizes[tt] = sz
+        if len(ok) != len(names):
+            ok = set(ok)
+            raise TypeError('Failed to determine size of %s' % \
+                ', '.join(names[i] for i in range(len(names)) if not i in ok))
+
+    return [_sizes[tt] for tt in tts]
 
 _typeids = {}
 def typeid(tt):
     """Returns the C++ runtime type information for type <tt>."""
-    if not isinstance(tt, type):
-        tt = type(tt)
+    tt = _as_type(tt)
     try:
         return _typeids[tt]
     except KeyError:
-        tidname = 'typeid_'+str(len(_typeids))
-        gbl.gInterpreter.ProcessLine(
-            "namespace _cppyy_internal { auto* %s = &typeid(%s); }" %\
-            (tidname, _get_name(tt),))
-        tid = getattr(gbl._cppyy_internal, tidname)
-        _typeids[tt] = tid
-        return tid
+        return typeid_many([tt])[0]
+
+def typeid_many(tts):
+    """Returns a list of the C++ runtime type information for the types in
+    <tts>, determining that of all types not seen before in one declaration."""
+    tts = [_as_type(tt) for tt in tts]
+
+    todo = dict()                   # canonical name -> types
+    for tt in tts:
+        if tt in _typeids:
+            continue
+        name = _canonical_name(tt)
+        if name in _typeids:
+            _typeids[tt] = _typeids[name]
+        else:
+            todo.setdefault(name, list()).append(tt)
+
+    if todo:
+        names = list(todo)
+        tidnames = ['typeid_%d' % next(_internal_count) for name in names]
+        ok = _declare_bulk(["namespace _cppyy_internal { auto* %s = &typeid(%s); }" % \
+                            (tidname, name) for tidname, name in zip(tidnames, names)])
+        if ok:
+            ns = gbl._cppyy_internal
+            for i in ok:
+                tid = _typeids[names[i]] = getattr(ns, tidnames[i])
+                for tt in todo[names[i]]:
+                    _typeids[tt] = tid
+        if len(ok) != len(names):
+            ok = set(ok)
+            raise TypeError('Failed to determine type information of %s' % \
+                ', '.join(names[i] for i in range(len(names)) if not i in ok))
+
+    return [_typeids[tt] for tt in tts]
+
+def _declare_instantiations(names):
+  # declared through cppdef, for the instantiations to be cached, and thus be
+  # part of the cppdef cache's PCH, if enabled
+    return _declare_bulk(['static_assert(sizeof(%s), "");' % name for name in names], declare=cppdef)
+
+def _instantiation(name):
+  # go through the Template object if possible, to have it memoize the class
+    if name[-1] == '>':
+        tmpl, args = name[:-1].split('<', 1)
+        scope = gbl
+        try:
+            for part in tmpl.split('::'):
+                if part:
+                    scope = getattr(scope, part)
+            if isinstance(scope, _backend.Template):
+                return scope[args]
+        except (AttributeError, TypeError):
+            pass
+    return _backend.CreateScopeProxy(name)
+
+def instantiate(names):
+    """Instantiate all template classes named in <names> (e.g. 'std::vector<int>')
+    in one declaration, then create and return the classes."""
+    ok = set(_declare_instantiations(names))
+    if len(ok) != len(names):
+        raise TypeError('Failed to instantiate %s' % \
+            ', '.join(names[i] for i in range(len(names)) if not i in ok))
+    return [_instantiation(name) for name in names]
+
+def replay_instantiations():
+    """Instantiate all template classes recorded in the manifest (set with the
+    CPPYY_TEMPLATE_MANIFEST envar) that have not been instantiated yet, e.g.
+    after loading the headers declaring them. Returns the number done."""
+    if _template_manifest is None:
+        return 0
+    names = _template_manifest.pending()
+  # failures (e.g. b/c of missing headers) are left for a later replay
+    names = [names[i] for i in _declare_instantiations(names)]
+    for name in names:
+        _instantiation(name)
+    _template_manifest.replayed(names)
+    return len(names)
+
+def template_stats():
+    """Returns the number of hits (by arguments and by canonical name) and misses
+    of the lookup of instantiated template classes."""
+    try:
+        return dict(_backend.Template._stats)
+    except AttributeError:
+        return {'hits' : 0, 'canonical_hits' : 0, 'misses' : 0}
+
+def startup_report():
+    """Returns the timings of the phases of importing cppyy."""
+    return _startup.report()
 
 def multi(*bases):      # after six, see also _typemap.py
     """Resolve metaclasses for multiple inheritance."""
@@ -437,8 +1550,21 @@ def multi(*bases):      # after six, see also _typemap.py
     return type.__new__(faux_meta, 'faux_meta', (), {})
 
 
+#- persistent manifest of template instantiations ----------------------------
+from . import _instantiations
+_template_manifest = _instantiations.Manifest.from_environ()
+if _template_manifest is not None and hasattr(_backend, 'Template'):
+    _backend.Template._manifest = _template_manifest
+    atexit.register(_template_manifest.save)
+    replay_instantiations()
+_startup.mark('instantiations')
+
+
 #- workaround (TODO: may not be needed with Clang9) --------------------------
 if 'win32' in sys.platform:
     cppdef("""template<>
     std::basic_ostream<char, std::char_traits<char>>& __cdecl std::endl<char, std::char_traits<char>>(
         std::basic_ostream<char, std::char_traits<char>>&);""")
+
+_startup.mark('finalize')
+_startup.dump()
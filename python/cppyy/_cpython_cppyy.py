@@ -1,7 +1,7 @@
 """ CPython-specific touch-ups
 """
 
-from . import _stdcpp_fix
+from . import _envcache, _startup, _stdcpp_fix
 from cppyy_backend import loader
 
 __all__ = [
@@ -25,6 +25,7 @@ _backend._cpp_backend = c
 # explicitly expose APIs from libcppyy
 import ctypes
 _w = ctypes.CDLL(_backend.__file__, ctypes.RTLD_GLOBAL)
+_startup.mark('backend_load')
 
 
 # some beautification for inspect (only on p2)
@@ -54,11 +55,48 @@ if sys.hexversion < 0x3000000:
 
 
 ### template support ---------------------------------------------------------
+_builtin_cpp_names = {int : 'int', float : 'float', bool : 'bool', str : 'std::string'}
+
+def _cpp_arg_name(arg):
+  # C++ name of template argument <arg> as MakeCppTemplateClass would use it,
+  # or None if not known
+    if type(arg) == str:
+        return ','.join(map(lambda x: x.strip(), arg.split(',')))
+    if type(arg) is bool:
+        return arg and 'true' or 'false'
+    if type(arg) is int:
+        return str(arg)
+    try:
+        return arg.__cpp_name__
+    except AttributeError:
+        pass
+    try:
+        return _builtin_cpp_names.get(arg)
+    except TypeError:
+        return None
+
+def _canonical_name(name):
+  # normalized whitespace and resolved typedefs (also of template arguments)
+    name = ' '.join(name.split())
+    return str(gbl.CppyyLegacy.TClassEdit.ResolveTypedef(name, True))
+
 class Template(object):  # expected/used by ProxyWrappers.cxx in CPyCppyy
     stl_sequence_types   = ['std::vector', 'std::list', 'std::set', 'std::deque']
     stl_unrolled_types   = ['std::pair']
     stl_fixed_size_types = ['std::array']
     stl_mapping_types    = ['std::map', 'std::unordered_map']
+  # element types of std::vector by (native) buffer format, for bulk copies
+    buffer_types = {'b' : 'signed char', 'B' : 'unsigned char', 'h' : 'short',
+                    'H' : 'unsigned short', 'i' : 'int', 'I' : 'unsigned int',
+                    'l' : 'long', 'L' : 'unsigned long', 'q' : 'long long',
+                    'Q' : 'unsigned long long', 'f' : 'float', 'd' : 'double'}
+
+    _manifest = None     # records instantiations, if enabled (see _instantiations.py)
+
+  # classes by canonical C++ name, shared by all templates, to find instantiations
+  # requested under different spellings of the same arguments
+    _classes = dict()
+    _stats   = {'hits' : 0, 'canonical_hits' : 0, 'misses' : 0}
 
     def __init__(self, name):
         self.__name__     = name
@@ -75,10 +113,25 @@ class Template(object):  # expected/used by ProxyWrappers.cxx in CPyCppyy
 
       # if already instantiated, return the existing class
         try:
-            return self._instantiations[args]
+            pyclass = self._instantiations[args]
+            self._stats['hits'] += 1
+            return pyclass
         except KeyError:
             pass
 
+      # if instantiated under another spelling, return the existing class
+        argnames = [_cpp_arg_name(arg) for arg in args]
+        canonical = None
+        if not None in argnames:
+            canonical = _canonical_name('%s<%s>' % (self.__cpp_name__, ','.join(argnames)))
+            try:
+                pyclass = self._instantiations[args] = self._classes[canonical]
+                self._stats['canonical_hits'] += 1
+                return pyclass
+            except KeyError:
+                pass
+        self._stats['misses'] += 1
+
       # construct the type name from the types or their string representation
         newargs = [self.__name__]
         for arg in args:
@@ -89,6 +142,11 @@ class Template(object):  # expected/used by ProxyWrappers.cxx in CPyCppyy
 
       # memoize the class to prevent spurious lookups/re-pythonizations
         self._instantiations[args] = pyclass
+        if canonical is not None:
+            self._classes[canonical] = pyclass
+        self._classes[_canonical_name(pyclass.__cpp_name__)] = pyclass
+        if self._manifest is not None:
+            self._manifest.add(pyclass.__cpp_name__)
 
       # special case pythonization (builtin_map is not available from the C-API)
         if 'push_back' in pyclass.__dict__ and not '__iadd__' in pyclass.__dict__:
@@ -108,12 +166,38 @@ class Template(object):  # expected/used by ProxyWrappers.cxx in CPyCppyy
 
         return pyclass
 
+    def instantiate_many(self, arglist):
+        """Instantiate this template for each of the argument tuples in <arglist>
+        (single arguments need not be in a tuple) in one declaration, then create
+        and return the classes."""
+        arglist = [type(args) is tuple and args or (args,) for args in arglist]
+        names = list()
+        for args in arglist:
+            if args in self._instantiations:
+                continue
+            argnames = [_cpp_arg_name(arg) for arg in args]
+            if not None in argnames:
+                names.append('%s<%s>' % (self.__cpp_name__, ','.join(argnames)))
+        if names:
+            import cppyy
+            cppyy._declare_instantiations(names)
+        return [self[args] for args in arglist]
+
     def __call__(self, *args):
       # for C++17, we're required to derive the type when using initializer syntax
       # (i.e. a tuple or list); not sure how to do that in general, but below the
       # most common cases are covered
         if args:
             args0 = args[0]
+            if self.__name__ == 'std::vector' and not type(args0) in (tuple, list, type):
+              # objects with a buffer of a known format are copied in bulk
+                try:
+                    buf = memoryview(args0)
+                    t = buf.ndim == 1 and self.buffer_types.get(buf.format.lstrip('@'))
+                    if t:
+                        return self[t](*args)
+                except TypeError:
+                    pass
             if args0 and (type(args0) is tuple or type(args0) is list):
                 t = type(args0[0])
                 if t is float: t = 'double'
@@ -135,7 +219,10 @@ class Template(object):  # expected/used by ProxyWrappers.cxx in CPyCppyy
                     if t1 is float: t1 = 'double'
                     t2 = type(pair[1])
                     if t2 is float: t2 = 'double'
-                    return self[t1, t2](*args)
+                    cls = self[t1, t2]
+                    if len(args) == 1 and hasattr(cls, 'from_dict'):
+                        return cls.from_dict(args0)
+                    return cls(*args)
 
                 return self.__getitem__(*(type(a) for a in args0))(*args)
 
@@ -151,35 +238,43 @@ gbl.__class__.__repr__ = lambda cls : '<namespace cppyy.gbl at 0x%x>' % id(cls)
 gbl.std =  _backend.CreateScopeProxy('std')
 # for move, we want our "pythonized" one, not the C++ template
 gbl.std.move  = _backend.move
+_startup.mark('global_namespaces')
 
 
 #- add to the dynamic path as needed -----------------------------------------
 import os
-def add_default_paths():
-    gSystem = gbl.gSystem
+def find_default_paths():
+    paths = []
     if os.getenv('CONDA_PREFIX'):
       # MacOS, Linux
         lib_path = os.path.join(os.getenv('CONDA_PREFIX'), 'lib')
-        if os.path.exists(lib_path): gSystem.AddDynamicPath(lib_path)
+        if os.path.exists(lib_path): paths.append(lib_path)
 
       # Windows
         lib_path = os.path.join(os.getenv('CONDA_PREFIX'), 'Library', 'lib')
-        if os.path.exists(lib_path): gSystem.AddDynamicPath(lib_path)
+        if os.path.exists(lib_path): paths.append(lib_path)
 
   # assuming that we are in PREFIX/lib/python/site-packages/cppyy, add PREFIX/lib to the search path
     lib_path = os.path.abspath(os.path.join(os.path.dirname(__file__), os.path.pardir, os.path.pardir, os.path.pardir))
-    if os.path.exists(lib_path): gSystem.AddDynamicPath(lib_path)
+    if os.path.exists(lib_path): paths.append(lib_path)
 
     try:
         with open('/etc/ld.so.conf') as ldconf:
             for line in ldconf:
                 f = line.strip()
                 if (os.path.exists(f)):
-                    gSystem.AddDynamicPath(f)
+                    paths.append(f)
     except IOError:
         pass
+    return paths
+
+def add_default_paths():
+    gSystem = gbl.gSystem
+    for lib_path in _envcache.cache.get('library_paths', find_default_paths, ['/etc/ld.so.conf']):
+        gSystem.AddDynamicPath(lib_path)
 add_default_paths()
-del add_default_paths
+del add_default_paths, find_default_paths
+_startup.mark('default_library_paths')
 
 
 #- exports -------------------------------------------------------------------
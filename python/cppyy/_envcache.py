@@ -0,0 +1,112 @@
+""" Persistent cache of the include and library search paths discovered during
+    import, to skip scanning of package metadata and the file system on later
+    imports. The cache file is keyed on the interpreter, the package versions
+    and install location, and validated against the modification times of
+    files read in discovery. Set the CPPYY_ENV_CACHE envar to a file name to
+    relocate it, or to 'none' to disable it.
+"""
+
+import hashlib, json, os, sys
+
+from ._version import __version__
+
+
+def _key():
+    try:
+        import cppyy_backend as cpb
+        backend_version = str(cpb.__version__)
+    except (ImportError, AttributeError):
+        backend_version = ''
+    return [sys.prefix, sys.executable, sys.version, __version__, backend_version,
+            os.path.dirname(os.path.abspath(__file__))] + \
+           [os.environ.get(v, '') for v in ('CONDA_PREFIX', 'CPPYY_API_PATH')]
+
+def _cache_file(key):
+    fname = os.environ.get('CPPYY_ENV_CACHE')
+    if fname:
+        if fname.lower() == 'none':
+            return None
+        return fname
+    cachedir = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    h = hashlib.sha1('\0'.join(key).encode('utf-8', 'surrogateescape')).hexdigest()
+    return os.path.join(cachedir, 'cppyy', 'env-%s.json' % h[:16])
+
+def _mtime(fname):
+    try:
+        return os.stat(fname).st_mtime
+    except OSError:
+        return None
+
+
+class EnvCache(object):
+    """Cached results of search path discovery functions."""
+
+    def __init__(self):
+        self.key   = _key()
+        self.fname = _cache_file(self.key)
+        self._data   = {}
+        self._stamps = {}
+        self._dirty  = False
+        self._loaded = False
+
+    def _load(self):
+        self._loaded = True
+        if self.fname is None:
+            return
+        try:
+            with open(self.fname) as f:
+                cache = json.load(f)
+        except (IOError, OSError, ValueError):
+            return
+        if cache.get('key') != self.key:
+            return
+      # files that were read during discovery must be unchanged
+        for fname, mtime in cache.get('stamps', {}).items():
+            if _mtime(fname) != mtime:
+                return
+        self._data   = cache.get('data', {})
+        self._stamps = cache.get('stamps', {})
+
+    def get(self, name, discover, depends=()):
+        """Return the cached result of <discover> under <name>, or run it and
+        cache its result, if valid. The result has to be JSON serializable and
+        should contain lists of paths; it is only valid while the files named
+        in <depends> are unmodified and all listed paths exist.
+        """
+        if not self._loaded:
+            self._load()
+
+        try:
+            result = self._data[name]
+            paths = result
+            if type(result) is dict:
+                paths = result['paths']
+            if all(os.path.isdir(p) for p in paths):
+                return result
+        except (KeyError, TypeError):
+            pass
+
+        result = discover()
+        self._data[name] = result
+        for fname in depends:
+            self._stamps[fname] = _mtime(fname)
+        self._dirty = True
+        return result
+
+    def save(self):
+        if not self._dirty or self.fname is None:
+            return
+        self._dirty = False
+        try:
+            cachedir = os.path.dirname(self.fname)
+            if cachedir and not os.path.isdir(cachedir):
+                os.makedirs(cachedir)
+          # write to a temporary and then rename, as other processes may be reading
+            tmpname = '%s.tmp%d' % (self.fname, os.getpid())
+            with open(tmpname, 'w') as f:
+                json.dump({'key' : self.key, 'stamps' : self._stamps, 'data' : self._data}, f)
+            os.replace(tmpname, self.fname)
+        except (IOError, OSError):
+            pass        # caching is an optimization only
+
+cache = EnvCache()
@@ -0,0 +1,69 @@
+""" Persistent manifest of template instantiations: the names of the classes
+    instantiated through Template objects are recorded and written at exit, to
+    be replayed in a single declaration on the next start. With the cppdef()
+    cache enabled, the replay is precompiled into its PCH.
+"""
+
+import json, os
+
+from ._pch import _backend_version, _write_json
+
+
+class Manifest(object):
+    """Ordered record of instantiated template class names."""
+
+    maxsize = 4096                        # most recently added names kept
+
+    def __init__(self, fname):
+        self.fname     = os.path.abspath(fname)
+        self.version   = _backend_version()
+        self.names     = self._load()
+        self._known    = set(self.names)
+        self._replayed = set()
+        self._dirty    = False
+
+    @classmethod
+    def from_environ(cls):
+        fname = os.environ.get('CPPYY_TEMPLATE_MANIFEST')
+        if not fname:
+            return None
+        return cls(fname)
+
+    def _load(self):
+        try:
+            with open(self.fname) as f:
+                manifest = json.load(f)
+            if manifest.get('backend') == self.version:
+                return manifest['names']
+        except (IOError, OSError, ValueError, KeyError):
+            pass
+        return list()
+
+    def add(self, name):
+        if not name in self._known:
+            self._known.add(name)
+            self.names.append(name)
+            self._dirty = True
+        self._replayed.add(name)          # instantiated, no replay needed
+
+    def pending(self):
+        """Returns the names not yet replayed or instantiated."""
+        return [name for name in self.names if not name in self._replayed]
+
+    def replayed(self, names):
+        self._replayed.update(names)
+
+    def save(self):
+        if not self._dirty:
+            return
+        self._dirty = False
+        try:
+            manifest = self._load()       # merge with concurrent processes
+            known = set(manifest)
+            manifest += [name for name in self.names if not name in known]
+            dirname = os.path.dirname(self.fname)
+            if not os.path.isdir(dirname):
+                os.makedirs(dirname)
+            _write_json(self.fname, {'backend' : self.version, 'names' : manifest[-self.maxsize:]})
+        except (IOError, OSError):
+            pass        # caching is an optimization only
@@ -0,0 +1,391 @@
+""" Precompiled header (PCH) support: building of PCHs that layer extra headers
+    on top of the standard ones, and a persistent cache of cppdef() sources.
+"""
+
+import hashlib, json, os, re, subprocess, sys, time, warnings
+
+
+def _backend_version():
+    try:
+        import cppyy_backend as cpb
+        return str(cpb.__version__)
+    except (ImportError, AttributeError):
+        return ''
+
+def _read_meta(pchname):
+    try:
+        with open(pchname+'.json') as f:
+            meta = json.load(f)
+    except (IOError, OSError, ValueError):
+        return None
+    if not os.path.exists(pchname):
+        return None
+    return meta
+
+def _write_json(fname, data):
+  # write to a temporary and then rename, as other processes may be reading
+    tmpname = '%s.tmp%d' % (fname, os.getpid())
+    with open(tmpname, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmpname, fname)
+
+def _find_header(header, include_paths):
+    if os.path.isabs(header):
+        return os.path.exists(header) and header or None
+    for p in include_paths:
+        fname = os.path.join(p, header)
+        if os.path.exists(fname):
+            return fname
+    return None
+
+def _is_current(pchname, meta):
+  # the loader rebuilds (as the standard one) any PCH older than the backend
+  # include directory, so apply the same test, then check the headers
+    try:
+        import cppyy_backend as cpb
+        pch_mtime = os.stat(pchname).st_mtime
+        incpath = os.path.join(os.path.dirname(cpb.__file__), 'include')
+        if os.path.exists(incpath) and pch_mtime < os.stat(incpath).st_mtime:
+            return False
+        for header in meta.get('user_headers', ()):
+            fname = _find_header(header, meta['include_paths'])
+            if fname is None or pch_mtime < os.stat(fname).st_mtime:
+                return False
+    except (ImportError, OSError, KeyError):
+        return False
+    return True
+
+def select(pchname):
+    os.putenv('CLING_STANDARD_PCH', pchname)
+    os.environ['CLING_STANDARD_PCH'] = pchname
+
+def user_pch():
+    """Returns the name and meta data of the PCH selected through the CPPYY_PCH
+    envar, or None if not set or not usable (with a warning).
+    """
+    pchname = os.environ.get('CPPYY_PCH')
+    if not pchname:
+        return None
+    pchname = os.path.abspath(pchname)
+    meta = _read_meta(pchname)
+    if meta is None or meta.get('backend') != _backend_version() or not _is_current(pchname, meta):
+        warnings.warn('PCH %s is missing or out of date; rebuild with "python -m cppyy.pch"' % pchname)
+        return None
+    return pchname, meta
+
+
+def build(pchname, headers, include_paths=(), meta=None):
+    """Build PCH <pchname> from the standard headers followed by <headers>,
+    located through <include_paths>. The <meta> dict is stored alongside.
+    """
+    import cppyy_backend as cpb
+    from cppyy_backend import loader
+
+    pkgpath = os.path.abspath(os.path.dirname(cpb.__file__))
+    makepch = os.path.join(pkgpath, 'etc', 'dictpch', 'makepch.py')
+    if not os.path.exists(makepch):
+        raise RuntimeError('Unable to build PCH: no such file %s' % makepch)
+
+    pchname = os.path.abspath(pchname)
+    pchdir  = os.path.dirname(pchname)
+    if not os.path.isdir(pchdir):
+        os.makedirs(pchdir)
+
+  # the PCH needs to be build with the same options as will be used at run-time
+    loader.set_cling_compile_options()
+
+    tmpname = '%s.tmp%d' % (pchname, os.getpid())
+    args = [sys.executable, makepch, tmpname, '-I'+os.path.join(pkgpath, 'include')]
+    args += ['-I'+os.path.abspath(p) for p in include_paths]
+    args += list(headers)
+    if subprocess.call(args, cwd=pkgpath) != 0 or not os.path.exists(tmpname):
+        try:
+            os.remove(tmpname)
+        except OSError:
+            pass
+        raise RuntimeError('Failed to build precompiled header "%s"' % pchname)
+    os.replace(tmpname, pchname)
+
+    if meta is None:
+        meta = dict()
+    meta['backend'] = _backend_version()
+    meta['headers'] = list(headers)
+    meta['include_paths'] = [os.path.abspath(p) for p in include_paths]
+    meta.setdefault('user_headers', list(headers))
+    _write_json(pchname+'.json', meta)
+    return pchname
+
+
+#- persistent cache of cppdef() sources --------------------------------------
+class CppdefCache(object):
+    """Cache of cppdef() sources, keyed on a hash of the source, the include
+    paths, and the backend version. Sources seen on a miss are stored in the
+    cache directory and at exit compiled into a PCH, which is selected as the
+    standard PCH on the next start, turning subsequent cppdef()s into hits.
+    Headers loaded with include() are recorded in the same order, so that the
+    sources that rely on them can be compiled. Sources that fail to compile
+    are remembered and left out of subsequent builds. Sources from files that
+    were modified since, or that conflict with new ones, are dropped.
+    """
+
+    default_maxsize = 32*1024*1024        # total bytes of cached sources
+
+    def __init__(self, cachedir, maxsize=None, base=None):
+        self.cachedir = os.path.abspath(cachedir)
+        self.base     = base                   # (name, meta) of user PCH
+        self.maxsize  = maxsize
+        if self.maxsize is None:
+            self.maxsize = self.default_maxsize
+        self.version  = _backend_version()
+        self.pchname  = os.path.join(self.cachedir, 'cppdef.pch.'+self.version)
+        self.hits     = 0
+        self.misses   = 0
+        self._stamp   = time.time()            # per process, for LRU ordering
+
+        self._indexname = os.path.join(self.cachedir, 'index.json')
+        self._entries   = self._load_index()   # ordered, as declared
+        self._lookup    = dict((e['key'], e) for e in self._entries)
+        self._available = set()                # keys compiled into active PCH
+        self._dirty     = False
+
+    @classmethod
+    def from_environ(cls, base=None):
+        cachedir = os.environ.get('CPPYY_CPPDEF_CACHE')
+        if not cachedir:
+            return None
+      # one cache per program, as programs may define the same names differently
+        main = getattr(sys, 'argv', None) and sys.argv[0] or ''
+        if os.path.isfile(main):
+            main = os.path.abspath(main)
+            digest = hashlib.sha1(main.encode('utf-8', 'surrogateescape')).hexdigest()
+            cachedir = os.path.join(cachedir, '%s-%s' % (os.path.basename(main), digest[:12]))
+        else:
+            cachedir = os.path.join(cachedir, 'main')
+        try:
+            maxsize = int(os.environ['CPPYY_CPPDEF_CACHE_SIZE'])
+        except (KeyError, ValueError):
+            maxsize = None
+        return cls(cachedir, maxsize, base)
+
+    def _load_index(self):
+        try:
+            with open(self._indexname) as f:
+                index = json.load(f)
+            if index.get('backend') == self.version:
+                return index['entries']
+        except (IOError, OSError, ValueError, KeyError):
+            pass
+        return list()
+
+    def activate(self):
+        """Select the cache's PCH, if any, unless a PCH was explicitly set."""
+        if 'CLING_STANDARD_PCH' in os.environ:
+            return False
+        meta = _read_meta(self.pchname)
+        if meta is None or meta.get('backend') != self.version or \
+                meta.get('base') != self._base_name() or not _is_current(self.pchname, meta):
+            return False
+      # the sources from edited files likely changed, and their old versions
+      # would conflict with the new ones if the PCH were loaded; same for any
+      # dropped before, if the PCH could not be rebuilt since
+        if self._drop([e['key'] for e in self._entries if self._is_edited(e)]) or \
+                not set(meta.get('keys', ())) <= set(self._lookup):
+            return False
+        select(self.pchname)
+        self._available = set(meta.get('keys', ()))
+        return True
+
+    def _is_edited(self, entry):
+        try:
+            fname, mtime = entry['origin']
+            return os.stat(fname).st_mtime != mtime
+        except KeyError:
+            return False
+        except OSError:
+            return True
+
+    def _drop(self, keys):
+        keys = set(keys)
+        if not keys:
+            return False
+        for key in keys:
+            try:
+                os.remove(os.path.join(self.cachedir, 'src', key+'.h'))
+            except OSError:
+                pass
+        self._entries   = [e for e in self._entries if not e['key'] in keys]
+        self._lookup    = dict((e['key'], e) for e in self._entries)
+        self._available = self._available - keys
+        self._dirty     = True
+        return True
+
+    def invalidate(self, diagnostics):
+        """Drop the sources from the active PCH that are referred to in the
+        <diagnostics> of a failed declaration; returns True if any."""
+        srcdir = os.path.join(self.cachedir, 'src')
+        keys = re.findall(re.escape(srcdir)+r'[/\\]([0-9a-f]+)\.h', diagnostics)
+        return self._drop(k for k in keys if k in self._available)
+
+    def key(self, src, incpath):
+        h = hashlib.sha1()
+        for part in (self.version, incpath, src):
+            h.update(part.encode('utf-8', 'surrogateescape'))
+            h.update(b'\0')
+        return h.hexdigest()
+
+    def lookup(self, key):
+        """Returns True if the source for <key> is available from the PCH."""
+        try:
+            entry = self._lookup[key]
+        except KeyError:
+            self.misses += 1
+            return False
+        entry['used'] = self._stamp
+        self._dirty = True
+        if key in self._available:
+            self.hits += 1
+            return True
+        self.misses += 1
+        return False
+
+    def record(self, key, src, incpath, header=None, origin=None):
+        """Store the successfully declared <src> under <key>; <header> is the
+        (resolved) name of the header file if <src> includes one, <origin> the
+        name of the file that declared it."""
+        if key in self._lookup:
+            return
+        srcdir = os.path.join(self.cachedir, 'src')
+        try:
+            if not os.path.isdir(srcdir):
+                os.makedirs(srcdir)
+            guard = 'CPPYY_CPPDEF_'+key
+            with open(os.path.join(srcdir, key+'.h'), 'w') as f:
+                f.write('#ifndef %s\n#define %s\n%s\n#endif\n' % (guard, guard, src))
+        except (IOError, OSError):
+            return
+
+        entry = {'key' : key, 'size' : len(src), 'used' : self._stamp,
+                 'include_paths' : re.findall(r'-I"([^"]*)"', incpath)}
+        if header is not None:
+            entry['header'] = header
+        if origin is not None and os.path.isfile(origin):
+            entry['origin'] = [os.path.abspath(origin), os.stat(origin).st_mtime]
+        self._entries.append(entry)
+        self._lookup[key] = entry
+        self._dirty = True
+
+    def _evict(self):
+      # drop the least recently used entries; on ties, drop the latest declared
+      # ones first, so that what remains is more likely to be self-consistent
+        total = sum(e['size'] for e in self._entries)
+        if total <= self.maxsize:
+            return
+        order = sorted(range(len(self._entries)),
+                       key=lambda i: (self._entries[i]['used'], -i))
+        evicted = set()
+        for i in order:
+            if total <= self.maxsize:
+                break
+            entry = self._entries[i]
+            if 'header' in entry:
+                continue         # needed by the sources that follow
+            total -= entry['size']
+            evicted.add(entry['key'])
+            try:
+                os.remove(os.path.join(self.cachedir, 'src', entry['key']+'.h'))
+            except OSError:
+                pass
+        self._entries = [e for e in self._entries if not e['key'] in evicted]
+        self._lookup  = dict((e['key'], e) for e in self._entries)
+
+    def clear(self):
+        """Remove all cached sources and the PCH built from them."""
+        for e in self._entries:
+            try:
+                os.remove(os.path.join(self.cachedir, 'src', e['key']+'.h'))
+            except OSError:
+                pass
+        for fname in (self.pchname, self.pchname+'.json', self._indexname):
+            try:
+                os.remove(fname)
+            except OSError:
+                pass
+        self._entries   = list()
+        self._lookup    = dict()
+        self._available = set()
+        self._dirty     = False
+
+    def _base_name(self):
+        return self.base is not None and self.base[0] or None
+
+    def _buildable(self):
+        return [e for e in self._entries if not e.get('failed')]
+
+    def rebuild(self):
+        """(Re)build the PCH from all currently cached sources, layered on top
+        of the user PCH, if any."""
+        entries = self._buildable()
+        keys = [e['key'] for e in entries]
+        headers, include_paths, user_headers = list(), list(), list()
+        if self.base is not None:
+            user_headers  = list(self.base[1]['user_headers'])
+            headers       = list(self.base[1]['headers'])
+            include_paths = list(self.base[1]['include_paths'])
+        headers += [os.path.join(self.cachedir, 'src', k+'.h') for k in keys]
+        user_headers += [e['header'] for e in entries if os.path.isabs(e.get('header', ''))]
+        for e in entries:
+            for p in e['include_paths']:
+                if not p in include_paths and os.path.isdir(p):
+                    include_paths.append(p)
+        build(self.pchname, headers, include_paths,
+              {'keys' : keys, 'base' : self._base_name(), 'user_headers' : user_headers})
+
+    def save(self):
+        """Persist the index and rebuild the PCH if new sources were seen."""
+        if not self._dirty:
+            return
+        self._dirty = False
+        self._evict()
+        if not self._write_index():
+            return
+
+        keys = [e['key'] for e in self._buildable()]
+        meta = _read_meta(self.pchname)
+        if meta is not None and meta.get('base') == self._base_name():
+            if meta.get('keys') == keys and _is_current(self.pchname, meta):
+                return
+            built = set(meta.get('keys', ()))
+        else:
+            built = set()
+        if not keys:
+            for fname in (self.pchname, self.pchname+'.json'):
+                try:
+                    os.remove(fname)
+                except OSError:
+                    pass
+            return
+
+        try:
+            self.rebuild()
+        except Exception as e:
+          # the sources new since the last build (e.g. depending on headers or
+          # libraries that are not recorded) are left out of future builds; if
+          # there are none, the cache no longer fits the environment, so reset
+            new = [entry for entry in self._buildable() if not entry['key'] in built]
+            if not new:
+                warnings.warn('cppdef cache cleared: %s' % str(e))
+                self.clear()
+                return
+            warnings.warn('%d source(s) excluded from the cppdef cache: %s' % (len(new), str(e)))
+            for entry in new:
+                entry['failed'] = True
+            self._write_index()
+
+    def _write_index(self):
+        try:
+            if not os.path.isdir(self.cachedir):
+                os.makedirs(self.cachedir)
+            _write_json(self._indexname, {'backend' : self.version, 'entries' : self._entries})
+        except (IOError, OSError):
+            return False
+        return True
@@ -4,28 +4,238 @@
 __all__ = [
     'add_pythonization',
     'remove_pythonization',
+    'dispatch_stats',
+    'set_pythonization_profiling',
+    'pythonization_stats',
     'pin_type',
     'add_type_reducer',
     ]
 
+import itertools, operator, re, time
+
 def _set_backend(backend):
     global _backend
     _backend = backend
 
 
+# Pythonizors that carry a compiled regex in <match_class> (such as those made
+# by the factories below) are indexed per scope, by exact name, by prefix, or
+# by a combined regex, with a single dispatcher registered with the backend,
+# so that binding a class only calls the pythonizors that match its name. Other
+# pythonizors are called for all classes, but go through the same dispatcher,
+# which keeps the order of registration and allows profiling.
+_stats = {'classes' : 0, 'called' : 0, 'skipped' : 0}
+
+_profiling = False
+_profile   = dict()             # (id, scope) -> (pythonizor, scope, {class -> [calls, time, exceptions]})
+
+def _profiled_call(pythonizor, scope, klass, name):
+    try:
+        record = _profile[(id(pythonizor), scope)]
+    except KeyError:
+        record = _profile[(id(pythonizor), scope)] = (pythonizor, scope, dict())
+    cppname = getattr(klass, '__cpp_name__', name)
+    try:
+        counts = record[2][cppname]
+    except KeyError:
+        counts = record[2][cppname] = [0, 0., 0]
+    start = time.perf_counter()
+    try:
+        pythonizor(klass, name)
+    except Exception:
+        counts[2] += 1
+        raise
+    finally:
+        counts[0] += 1
+        counts[1] += time.perf_counter() - start
+
+def _pythonizor_label(pythonizor):
+    label = getattr(pythonizor, '__qualname__', None) or type(pythonizor).__qualname__
+    module = getattr(pythonizor, '__module__', None)
+    if module:
+        label = module + '.' + label
+    regex = getattr(pythonizor, 'match_class', None)
+    if hasattr(regex, 'pattern'):
+        label += '(%s)' % regex.pattern
+    return label
+
+_META = set('.^$*+?{}[]\\|()')
+
+class _Registry(object):
+    def __init__(self, scope):
+        self.scope    = scope
+        self.order    = 0
+        self.always   = list()        # (order, pythonizor), without regex
+        self.exact    = dict()        # name -> [(order, pythonizor)]
+        self.prefix   = dict()        # length -> {prefix -> [(order, pythonizor)]}
+        self.patterns = list()        # (order, regex, pythonizor), combinable
+        self.separate = list()        # (order, regex, pythonizor), not combinable
+        self.combined = None
+        self.size     = 0
+
+    def add(self, pythonizor, regex):
+        self.order += 1
+        entry = (self.order, pythonizor)
+        if regex is None:
+            self.always.append(entry)
+            return
+        pattern = regex.pattern
+        if pattern[:1] == '^':
+            pattern = pattern[1:]
+        literal = pattern[:-1] if pattern[-1:] == '$' else pattern
+        if type(pattern) is str and regex.flags == re.UNICODE and not (_META & set(literal)):
+            if literal != pattern:
+                self.exact.setdefault(literal, list()).append(entry)
+            else:
+                self.prefix.setdefault(len(literal), dict()).setdefault(literal, list()).append(entry)
+        elif regex.flags == re.UNICODE and not re.search(r'\\\d|\(\?P[<=]|\(\?\(|^\(\?[aiLmsux]', regex.pattern):
+            self.patterns.append((self.order, regex, pythonizor))
+            self.combined = None
+        else:
+            self.separate.append((self.order, regex, pythonizor))
+        self.size += 1
+
+    def remove(self, pythonizor):
+        keep = [e for e in self.always if e[1] is not pythonizor]
+        found = len(keep) != len(self.always)
+        self.always[:] = keep
+        for index in [self.exact]+list(self.prefix.values()):
+            for key, entries in list(index.items()):
+                keep = [e for e in entries if e[1] is not pythonizor]
+                if len(keep) != len(entries):
+                    found = True
+                    if keep: index[key] = keep
+                    else: del index[key]
+        for entries in (self.patterns, self.separate):
+            keep = [e for e in entries if e[2] is not pythonizor]
+            if len(keep) != len(entries):
+                found = True
+                entries[:] = keep
+        if found:
+            self.combined = None
+            self.size = sum(len(e) for e in self.exact.values()) + \
+                sum(len(e) for d in self.prefix.values() for e in d.values()) + \
+                len(self.patterns) + len(self.separate)
+        return found
+
+    def _combine(self):
+      # one optional lookahead per pattern, so that a single match tells which
+      # patterns match (the groups that participate)
+      # patterns that can not be combined after all are matched separately
+        try:
+            self.combined = re.compile(''.join(['(?:(?=(?P<_p%d>%s)))?' % (i, e[1].pattern)
+                                                for i, e in enumerate(self.patterns)]))
+        except re.error:
+            self.separate = sorted(self.separate + self.patterns, key=lambda e: e[0])
+            self.patterns = list()
+            self.combined = None
+
+    def __call__(self, klass, name):
+        nalways = len(self.always)
+        matched = self.always + list(self.exact.get(name, ()))
+        for length, prefixes in self.prefix.items():
+            entries = prefixes.get(name[:length])
+            if entries:
+                matched += entries
+        if self.patterns and self.combined is None:
+            self._combine()
+        if self.patterns:
+            m = self.combined.match(name)
+            for i, e in enumerate(self.patterns):
+                if m.group('_p%d' % i) is not None:
+                    matched.append((e[0], e[2]))
+        for e in self.separate:
+            if e[1].match(name):
+                matched.append((e[0], e[2]))
+
+        if self.size:
+            _stats['classes'] += 1
+            _stats['called']  += len(matched) - nalways
+            _stats['skipped'] += self.size - (len(matched) - nalways)
+
+        matched.sort(key=lambda e: e[0])
+        if not _profiling:
+            for order, pythonizor in matched:
+                pythonizor(klass, name)
+        else:
+            for order, pythonizor in matched:
+                _profiled_call(pythonizor, self.scope, klass, name)
+
+_registries = dict()
+
+
 # user-provided, general pythonizations
 def add_pythonization(pythonizor, scope = ''):
     """<pythonizor> should be a callable taking two arguments: a class proxy,
     and its C++ name. It is called each time a named class from <scope> (the
     global one by default, but a relevant C++ namespace is recommended) is bound.
+    If <pythonizor> has a compiled regex as its <match_class> attribute, it is
+    only called for classes whose name matches.
     """
-    return _backend.add_pythonization(pythonizor, scope)
+    if not callable(pythonizor):
+        raise TypeError("given '%s' object is not callable" % str(pythonizor))
+    regex = getattr(pythonizor, 'match_class', None)
+    if not hasattr(regex, 'pattern') or not hasattr(regex, 'match'):
+        regex = None
+    try:
+        registry = _registries[scope]
+    except KeyError:
+        registry = _registries[scope] = _Registry(scope)
+        _backend.add_pythonization(registry, scope)
+    registry.add(pythonizor, regex)
+    return True
 
 def remove_pythonization(pythonizor, scope = ''):
     """Remove previously registered <pythonizor> from <scope>.
     """
+    registry = _registries.get(scope)
+    if registry is not None and registry.remove(pythonizor):
+        return True
     return _backend.remove_pythonization(pythonizor, scope)
 
+def dispatch_stats():
+    """Returns the number of classes dispatched to indexed pythonizors (those
+    with a <match_class> regex), and the number of such pythonizors called and
+    skipped on account of their name not matching.
+    """
+    return dict(_stats)
+
+def set_pythonization_profiling(enable=True):
+    """Start (or stop, if <enable> is False) recording, per pythonizor and per
+    class, the number of calls, the time spent, and the number of exceptions
+    raised. This covers all pythonizors added through add_pythonization(),
+    including the standard ones for the STL.
+    """
+    global _profiling
+    _profiling = bool(enable)
+
+def pythonization_stats(reset=False):
+    """Returns the statistics recorded since profiling was enabled (see
+    set_pythonization_profiling()), as a dictionary (that can be dumped as
+    JSON) keyed by pythonizor, with totals and a breakdown per class bound.
+    Times are in seconds and include those of classes bound by the pythonizor
+    itself. If <reset> is True, the recorded statistics are cleared.
+    """
+    result = dict()
+    for pythonizor, scope, classes in list(_profile.values()):
+        label = _pythonizor_label(pythonizor)
+        if label in result:
+            n = 2
+            while '%s#%d' % (label, n) in result:
+                n += 1
+            label = '%s#%d' % (label, n)
+        per_class = dict((cppname, {'calls' : c[0], 'time' : c[1], 'exceptions' : c[2]})
+                         for cppname, c in classes.items())
+        result[label] = {
+            'scope'      : scope,
+            'calls'      : sum(c['calls'] for c in per_class.values()),
+            'time'       : sum(c['time'] for c in per_class.values()),
+            'exceptions' : sum(c['exceptions'] for c in per_class.values()),
+            'classes'    : per_class }
+    if reset:
+        _profile.clear()
+    return result
+
 
 # prevent auto-casting (e.g. for interfaces)
 def pin_type(klass):
@@ -56,6 +266,16 @@ def set_ownership_policy(match_class, match_method, python_owns_result):
                                '__creates__', int(python_owns_result))
 
 
+# The listing of members from dir() is based on reflection and does not bind
+# any of them, but getattr() does; so select by name first and only retrieve
+# the members that match (if any).
+def _matching_members(obj, regex):
+    for k in dir(obj):
+        match = regex.match(k)
+        if match:
+            yield k, match
+
+
 # NB: Ideally, we'd use the version commented out below, but for now, we
 #     make do with the hackier version here.
 def rename_attribute(match_class, orig_attribute, new_attribute, keep_orig=False):
@@ -88,11 +308,10 @@ def rename_attribute(match_class, orig_attribute, new_attribute, keep_orig=False
         def __call__(self, obj, name):
             if not self.match_class.match(name):
                 return
-            for k in dir(obj): #.__dict__:
-                if self.match_attr.match(k):
-                    tmp = property(self.getter(k), self.setter(k), self.deleter(k))
-                    setattr(obj, self.new_attr, tmp)
-                    #if not self.keep_orig: delattr(obj, k)
+            for k, match in _matching_members(obj, self.match_attr):
+                tmp = property(self.getter(k), self.setter(k), self.deleter(k))
+                setattr(obj, self.new_attr, tmp)
+                #if not self.keep_orig: delattr(obj, k)
     return attribute_pythonizor(match_class, orig_attribute, new_attribute, keep_orig)
 
 # def rename_attribute(match_class, orig_attribute, new_attribute, keep_orig=False):
@@ -133,44 +352,68 @@ def add_overload(match_class, match_method, overload):
         def __call__(self, obj, name):
             if not self.match_class.match(name):
                 return
-            for k in dir(obj): #.__dict__:
-               try:
-                   tmp = getattr(obj, k)
-               except:
-                   continue
-               if self.match_method.match(k):
-                   try:
-                       tmp.__add_overload__(overload)
-                   except AttributeError: pass
+            for k, match in _matching_members(obj, self.match_method):
+                try:
+                    tmp = getattr(obj, k)
+                except:
+                    continue
+                try:
+                    tmp.__add_overload__(self.overload)
+                except AttributeError: pass
     return method_pythonizor(match_class, match_method, overload)
 
 
-def compose_method(match_class, match_method, g):
+def compose_method(match_class, match_method, g, vectorized=False):
     class composition_pythonizor(object):
-        def __init__(self, match_class, match_method, g):
+        def __init__(self, match_class, match_method, g, vectorized):
             import re
             self.match_class = re.compile(match_class)
             self.match_method = re.compile(match_method)
             self.g = g
+            self.vectorized = vectorized
+
+      # the composed method is called as h(self, *args), with a batch version,
+      # added as method <name>_batch(self, argseq) unless a member of that name
+      # exists, that calls the original (bound once) for each tuple of arguments
+      # in <argseq> without going through h; if vectorized, g is called once
+      # with the list of all results (and returns a list)
+        def make_fun(self, f, g):
+            def h(self, *args, **kwargs):
+                if kwargs:
+                    return g(self, f(self, *args, **kwargs))
+                return g(self, f(self, *args))
+            def batch(self, argseq):
+                return list(map(g, itertools.repeat(self), itertools.starmap(f.__get__(self), argseq)))
+            return h, batch
+
+        def make_vectorized_fun(self, f, g):
+            def h(self, *args, **kwargs):
+                return g(self, [f(self, *args, **kwargs)])[0]
+            def batch(self, argseq):
+                return g(self, list(itertools.starmap(f.__get__(self), argseq)))
+            return h, batch
 
         def __call__(self, obj, name):
             if not self.match_class.match(name):
                 return
             g = self.g
-            for k in obj.__dict__:
+            make_fun = self.vectorized and self.make_vectorized_fun or self.make_fun
+            for k in list(obj.__dict__):
                 if not self.match_method.match(k):
                     continue
                 try:
                     f = getattr(obj, k)
                 except:
                     continue
-                def make_fun(f, g):
-                    def h(self, *args, **kwargs):
-                        return g(self, f(self, *args, **kwargs))
-                    return h
-                h = make_fun(f, g)
+                if getattr(f, '_cppyy_batch', False):
+                    continue             # batch version from a composition
+                h, batch = make_fun(f, g)
                 setattr(obj, k, h)
-    return composition_pythonizor(match_class, match_method, g)
+                batch._cppyy_batch = True
+                if not getattr(getattr(obj, k+'_batch', batch), '_cppyy_batch', False):
+                    continue             # name taken by a C++ (or user) member
+                setattr(obj, k+'_batch', batch)
+    return composition_pythonizor(match_class, match_method, g, vectorized)
 
 
 def set_method_property(match_class, match_method, prop, value):
@@ -185,16 +428,55 @@ def set_method_property(match_class, match_method, prop, value):
         def __call__(self, obj, name):
             if not self.match_class.match(name):
                 return
-            for k in dir(obj): #.__dict__:
+            for k, match in _matching_members(obj, self.match_method):
                 try:
                     tmp = getattr(obj, k)
                 except:
                     continue
-                if self.match_method.match(k):
-                    setattr(tmp, self.prop, self.value)
+                setattr(tmp, self.prop, self.value)
     return method_pythonizor(match_class, match_method, prop, value)
 
 
+# Properties made by make_property() that call C++ accessors bound once, per
+# class, with the names of their accessors: classes derived from these (in
+# Python, or in C++) that redefine any of the accessors, get a property that
+# looks up the accessors by name instead.
+_bound_properties = dict()      # class -> [(prop_name, (getter, setter, deleter))]
+
+class _setter_proxy(object):
+    def __init__(self, setter):
+        self.setter = setter
+
+    def __call__(self, obj, arg):
+        return getattr(obj, self.setter)(arg)
+
+def _rebind_properties(cls):
+    mro = cls.__mro__
+    for i in range(1, len(mro)):
+        for prop_name, accessors in _bound_properties.get(mro[i], ()):
+            derived = mro[:i]
+            if any(prop_name in c.__dict__ for c in derived):
+                continue
+            if any(k in c.__dict__ for c in derived for k in accessors if k):
+                getter, setter, deleter = accessors
+                setattr(cls, prop_name, property(getter and operator.methodcaller(getter),
+                                                 setter and _setter_proxy(setter),
+                                                 deleter and operator.methodcaller(deleter)))
+
+def _add_bound_property(klass, prop_name, accessors):
+    if not klass in _bound_properties:
+        _bound_properties[klass] = list()
+        prev = klass.__dict__.get('__init_subclass__')
+        def __init_subclass__(cls, **kwargs):
+            _rebind_properties(cls)
+            if prev is not None:
+                prev.__get__(None, cls)(**kwargs)
+            else:
+                super(klass, cls).__init_subclass__(**kwargs)
+        klass.__init_subclass__ = classmethod(__init_subclass__)
+    _bound_properties[klass].append((prop_name, accessors))
+
+
 def make_property(match_class, match_get, match_set=None, match_del=None, prop_name=None):
     class property_pythonizor(object):
         def __init__(self, match_class, match_get, match_set, match_del, prop_name):
@@ -229,114 +511,95 @@ def make_property(match_class, match_get, match_set=None, match_del=None, prop_n
 
             self.prop_name = prop_name
 
-        def make_get_del_proxy(self, getter):
-            class proxy(object):
-                def __init__(self, getter):
-                    self.getter = getter
-
-                def __call__(self, obj):
-                    return getattr(obj, self.getter)()
-            return proxy(getter)
-
-        def make_set_proxy(self, setter):
-            class proxy(object):
-                def __init__(self, setter):
-                    self.setter = setter
-
-                def __call__(self, obj, arg):
-                    return getattr(obj, self.setter)(arg)
-            return proxy(setter)
-
-        def __call__(self, obj, name):
-            if not self.match_class.match(name):
-                return
-
-            names = []
-            named_getters = {}
-            named_setters = {}
-            named_deleters = {}
-
-            if not self.match_many:
-                fget, fset, fdel = None, None, None
-
-            for k in dir(obj): #.__dict__:
-                match = self.match_get.match(k)
+        def bind_once(self, obj):
+          # accessors of classes without virtual methods are bound once and the
+          # C++ overload is then called directly; otherwise, they are looked up
+          # by name on each access, so that overrides in derived classes are
+          # honored (calling an unbound overload is a non-virtual call); derived
+          # classes that redefine accessors are handled on their creation
+            try:
+                legacy = _backend.CppyyLegacy
+                klass = legacy.TClass.GetClass(obj.__cpp_name__)
+                return not (klass.ClassProperty() & legacy.kClassHasVirtual)
+            except Exception:
+                return False
+
+        def make_get_del_proxy(self, getter, method=None):
+            if method is not None:
+                return method
+            return operator.methodcaller(getter)
+
+        def make_set_proxy(self, setter, method=None):
+            if method is not None:
+                return method
+            return _setter_proxy(setter)
+
+        def find_accessors(self, obj, match_accessor):
+            accessors = {}
+            for k, match in _matching_members(obj, match_accessor):
                 try:
                     tmp = getattr(obj, k)
                 except:
                     continue
-                if match and hasattr(tmp, '__call__'):
+                if hasattr(tmp, '__call__'):
                     if self.match_many:
-                        name = match.group(1)
-                        named_getters[name] = k
+                        accessors[match.group(1)] = (k, tmp)
                     else:
-                        fget = self.make_get_del_proxy(k)
+                        accessors[None] = (k, tmp)
                         break
+            return accessors
 
-            if self.match_set:
-                for k in dir(obj): #.__dict__:
-                    match = self.match_set.match(k)
-                    try:
-                        tmp = getattr(obj, k)
-                    except:
-                        continue
-                    if match and hasattr(tmp, '__call__'):
-                        if self.match_many:
-                            name = match.group(1)
-                            named_setters[name] = k
-                        else:
-                            fset = self.make_set_proxy(k)
-                            break
+        def __call__(self, obj, name):
+            if not self.match_class.match(name):
+                return
 
+            named_getters = self.find_accessors(obj, self.match_get)
+            named_setters, named_deleters = {}, {}
+            if self.match_set:
+                named_setters = self.find_accessors(obj, self.match_set)
             if self.match_del:
-                for k in dir(obj): #.__dict__:
-                    match = self.match_del.match(k)
-                    try:
-                        tmp = getattr(obj, k)
-                    except:
-                        continue
-                    if match and hasattr(tmp, '__call__'):
-                        if self.match_many:
-                            name = match.group(1)
-                            named_deleters[name] = k
-                        else:
-                            fdel = self.make_get_del_proxy(k)
-                            break
-
-            if not self.match_many:
-                new_prop = property(fget, fset, fdel)
-                setattr(obj, self.prop_name, new_prop)
-                return
+                named_deleters = self.find_accessors(obj, self.match_del)
 
-            names += list(named_getters.keys())
-            names += list(named_setters.keys())
-            names += list(named_deleters.keys())
-            names = set(names)
+            if self.match_many:
+                names = set(named_getters) | set(named_setters) | set(named_deleters)
+            else:
+                names = [None]
+
+            bind = None
+            def resolve(accessor):
+                nonlocal bind
+                k, tmp = accessor
+                overload = getattr(_backend, 'CPPOverload', None)
+                if overload is None or not isinstance(tmp, overload):
+                    return k, None
+                if bind is None:
+                    bind = self.bind_once(obj)
+                return k, bind and tmp or None
 
-            properties = []
             for name in names:
-                if name in named_getters:
-                    fget = self.make_get_del_proxy(named_getters[name])
-                else:
-                    fget = None
-
-                if name in named_setters:
-                    fset = self.make_set_proxy(named_setters[name])
-                else:
-                    fset = None
-
-                if name in named_deleters:
-                    fdel = self.make_get_del_proxy(named_deleters[name])
-                else:
-                    fdel = None
+                getter, fget = name in named_getters and resolve(named_getters[name]) or (None, None)
+                setter, fset = name in named_setters and resolve(named_setters[name]) or (None, None)
+                deleter, fdel = name in named_deleters and resolve(named_deleters[name]) or (None, None)
+                is_bound = fget is not None or fset is not None or fdel is not None
+
+                if getter is not None:
+                    fget = self.make_get_del_proxy(getter, fget)
+                if setter is not None:
+                    fset = self.make_set_proxy(setter, fset)
+                if deleter is not None:
+                    fdel = self.make_get_del_proxy(deleter, fdel)
 
                 new_prop = property(fget, fset, fdel)
-                if self.prop_name:
+                if not self.match_many:
+                    prop_name = self.prop_name
+                elif self.prop_name:
                     prop_name = self.prop_name.format(name)
                 else:
                     prop_name = name
 
                 setattr(obj, prop_name, new_prop)
+                if is_bound:
+                    _add_bound_property(obj, prop_name, (getter, setter, deleter))
 
     return property_pythonizor(match_class, match_get, match_set, match_del, prop_name)
 
@@ -0,0 +1,49 @@
+""" Timing of the phases of importing cppyy, recorded as a sequence of check
+    points, with each check point ending the phase named by it.
+"""
+
+import os, sys, time
+
+try:
+    _now = time.perf_counter_ns
+except AttributeError:      # p3.6
+    def _now():
+        return int(time.perf_counter()*1E9)
+
+_start  = _now()
+_last   = _start
+_phases = []
+
+
+def mark(phase):
+    """End <phase>, which started at the previous check point."""
+    global _last
+    now = _now()
+    _phases.append((phase, _last-_start, now-_last))
+    _last = now
+
+def report():
+    """Returns a list of dicts with the name, start (relative to the start of
+    the import), and duration, in nanoseconds, of each phase."""
+    return [{'phase' : name, 'start_ns' : start, 'duration_ns' : duration}
+            for name, start, duration in _phases]
+
+def dump():
+    """Write the report as a table to stderr if CPPYY_STARTUP_PROFILE is '1', or
+    as JSON to the file it names otherwise."""
+    dest = os.environ.get('CPPYY_STARTUP_PROFILE')
+    if not dest or dest == '0':
+        return
+
+    rep = report()
+    if dest == '1':
+        total = sum(p['duration_ns'] for p in rep) or 1
+        sys.stderr.write('cppyy startup profile:\n')
+        for p in rep:
+            sys.stderr.write('  %-24s %10.3f ms  %5.1f%%\n' % \
+                (p['phase'], p['duration_ns']/1E6, 100.*p['duration_ns']/total))
+        sys.stderr.write('  %-24s %10.3f ms\n' % ('total', total/1E6))
+    else:
+        import json
+        with open(dest, 'w') as f:
+            json.dump(rep, f, indent=1)
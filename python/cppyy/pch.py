@@ -0,0 +1,40 @@
+""" Build a precompiled header (PCH) of project headers, layered on top of the
+    standard one. Usage:
+
+    $ python -m cppyy.pch -o /path/to/project.pch -I/path/to/include header.h ...
+    $ export CPPYY_PCH=/path/to/project.pch
+
+    With CPPYY_PCH set, the PCH is selected on import of cppyy (unless out of
+    date wrt. its headers or the backend) and its include paths are added.
+"""
+
+import argparse, sys
+
+__all__ = [
+    'main',
+    ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m cppyy.pch',
+        description='Build a precompiled header of project headers for cppyy.')
+    parser.add_argument('-o', '--output', required=True,
+        help='name of the PCH file to create')
+    parser.add_argument('-I', dest='include_paths', action='append', default=[],
+        help='add a path to search for headers')
+    parser.add_argument('headers', nargs='+',
+        help='headers to precompile, in order')
+    args = parser.parse_args(argv)
+
+    import cppyy
+    try:
+        pchname = cppyy.build_pch(args.output, args.headers, args.include_paths)
+    except (OSError, RuntimeError) as e:
+        sys.stderr.write('%s\n' % str(e))
+        return 1
+    print(pchname)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
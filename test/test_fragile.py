@@ -542,6 +542,26 @@ class TestFRAGILE:
         with raises(SyntaxError):
             cppyy.cppexec("doesnotexist");
 
+        cppyy.cppdef("""namespace cppexec_cache {
+        int count = 0;
+        void poke(int i) { count += i; } }""")
+
+        for i in range(3):
+            assert cppyy.cppexec("cppexec_cache::poke(2)") == True
+        assert cppyy.cppexec("cppexec_cache::count") is True
+        assert cppyy.cppexec("cppexec_cache::count", value=True) == 6
+        assert cppyy.cppexec("cppexec_cache::count * 2;", value=True) == 12
+        assert cppyy.cppexec('std::string("aap")', value=True) == "aap"
+
+      # declarations remain in the global scope, also on repeat
+        for i in range(2):
+            cppyy.cppexec("int cppexec_cache_var = %d" % 42)
+            assert cppyy.cppexec("cppexec_cache::count = cppexec_cache_var; cppexec_cache::poke(1)")
+            assert cppyy.gbl.cppexec_cache.count == 43
+
+        with raises(SyntaxError):
+            cppyy.cppexec("doesnotexist + 1");
+
     def test23_set_debug(self):
         """Setting of global gDebug variable"""
 
@@ -615,6 +635,25 @@ class TestFRAGILE:
         cppyy.cppdef('#define SOME_INT 42')
         assert cppyy.macro("SOME_INT") == 42
 
+        cppyy.cppdef("""
+        #define MACROS_INT 42
+        #define MACROS_DOUBLE 3.14
+        #define MACROS_STRING "Hello, World!"
+        #define MACROS_BROKEN 1+""")
+
+        result = cppyy.macros(["MACROS_INT", "MACROS_DOUBLE", "MACROS_STRING",
+                               "MACROS_BROKEN", "MACROS_UNDEFINED", "SOME_INT"])
+        assert result["MACROS_INT"]    == 42
+        assert result["MACROS_DOUBLE"] == 3.14
+        assert result["MACROS_STRING"] == "Hello, World!"
+        assert result["SOME_INT"]      == 42
+        assert type(result["MACROS_BROKEN"])    == ValueError
+        assert type(result["MACROS_UNDEFINED"]) == ValueError
+        assert "MACROS_UNDEFINED" in str(result["MACROS_UNDEFINED"])
+
+        assert cppyy.macro("MACROS_INT") == 42
+        assert cppyy.macros(["MACROS_INT"]) == {"MACROS_INT" : 42}
+
     def test27_pickle_enums(self):
         """Pickling of enum types"""
 
@@ -654,6 +693,454 @@ class TestFRAGILE:
         cppyy.cppdef("struct VectorDatamember { std::vector<unsigned> v; };")
         cppyy.gbl.VectorDatamember     # used to crash on Mac arm64
 
+    def test30_cppdef_cache(self, tmpdir):
+        """Bookkeeping of the persistent cppdef cache"""
+
+        import cppyy, warnings
+        from cppyy._pch import CppdefCache
+
+        cachedir = str(tmpdir.join('cppdef_cache'))
+        incpath = cppyy.gbl.gInterpreter.GetIncludePath()
+
+        cache = CppdefCache(cachedir, maxsize=64)
+        src1 = "namespace cppdef_cache { int f1() { return 1; } }"
+        src2 = "namespace cppdef_cache { int f2() { return 2; } }"
+        key1, key2 = cache.key(src1, incpath), cache.key(src2, incpath)
+        assert key1 != key2
+        assert key1 != cache.key(src1, incpath+' -I"/does/not/exist"')
+
+      # nothing is available until a PCH has been built and activated
+        assert not cache.lookup(key1)
+        cache.record(key1, src1, incpath)
+        cache.record(key2, src2, incpath)
+        assert not cache.lookup(key1)
+        assert cache.misses == 2 and cache.hits == 0
+        assert os.path.exists(os.path.join(cachedir, 'src', key1+'.h'))
+
+      # size bound: evict from the latest declared when equally recently used
+        cache._evict()
+        assert [e['key'] for e in cache._entries] == [key1]
+        assert not os.path.exists(os.path.join(cachedir, 'src', key2+'.h'))
+
+      # included headers are kept, as later sources may depend on them
+        src3 = '#include "/does/not/exist/cppdef_cache.h"'
+        key3 = cache.key(src3, incpath)
+        cache.record(key3, src3, incpath, header='/does/not/exist/cppdef_cache.h')
+        cache.record(key2, src2, incpath)
+        cache._evict()
+        assert [e['key'] for e in cache._entries] == [key3]
+
+      # sources that fail to build are excluded from later builds, not retried
+        def failed_build():
+            raise RuntimeError('failed build')
+        cache.rebuild = failed_build
+        cache.record(key1, src1, incpath)
+        cache.maxsize = 1024
+        with warnings.catch_warnings(record=True) as w:
+            warnings.simplefilter('always')
+            cache.save()
+        assert len(w) == 1
+        assert 'excluded' in str(w[0].message)
+        assert [e.get('failed') for e in cache._entries] == [True, True]
+        assert not cache._buildable()
+        cache._dirty = True
+        cache.save()                  # nothing left to build
+        assert len(cache._entries) == 2
+
+        cache.clear()
+        assert not cache._entries
+        assert not os.path.exists(os.path.join(cachedir, 'src', key1+'.h'))
+
+    def test31_build_pch(self, tmpdir):
+        """Error reporting of user-level PCH building and selection"""
+
+        import cppyy, warnings
+        from cppyy import _pch
+
+        pchname = str(tmpdir.join('user.pch'))
+        with raises(OSError):
+            cppyy.build_pch(pchname, ['user.h'], [str(tmpdir.join('does_not_exist'))])
+
+        oldpch = os.environ.get('CPPYY_PCH')
+        os.environ['CPPYY_PCH'] = pchname
+        try:
+            with warnings.catch_warnings(record=True) as w:
+                warnings.simplefilter('always')
+                assert _pch.user_pch() is None
+            assert len(w) == 1
+            assert 'out of date' in str(w[0].message)
+        finally:
+            if oldpch is None:
+                del os.environ['CPPYY_PCH']
+            else:
+                os.environ['CPPYY_PCH'] = oldpch
+
+    def test32_startup_report(self):
+        """Timing of the phases of importing cppyy"""
+
+        import cppyy
+
+        report = cppyy.startup_report()
+        phases = [p['phase'] for p in report]
+        for phase in ['pch', 'backend', 'autoloading', 'typemap', 'finalize']:
+            assert phase in phases
+        assert phases[-1] == 'finalize'
+
+        start = 0
+        for p in report:
+            assert p['start_ns'] == start
+            assert 0 <= p['duration_ns']
+            start += p['duration_ns']
+
+    def test33_env_cache(self, tmpdir):
+        """Persistent caching of discovered search paths"""
+
+        import time
+        from cppyy import _envcache
+
+        depfile = tmpdir.join('depends.conf')
+        depfile.write('')
+        incdir = tmpdir.mkdir('include')
+
+        ncalls = [0]
+        def discover():
+            ncalls[0] += 1
+            return {'paths' : [str(incdir)], 'warning' : None}
+
+        oldcache = os.environ.get('CPPYY_ENV_CACHE')
+        os.environ['CPPYY_ENV_CACHE'] = str(tmpdir.join('env.json'))
+        try:
+            cache = _envcache.EnvCache()
+            assert cache.get('paths', discover, [str(depfile)])['paths'] == [str(incdir)]
+            cache.save()
+            assert ncalls[0] == 1
+
+          # cached across instances (i.e. processes)
+            cache = _envcache.EnvCache()
+            assert cache.get('paths', discover, [str(depfile)])['paths'] == [str(incdir)]
+            assert ncalls[0] == 1
+
+          # invalidated by changes to the files read during discovery
+            depfile.setmtime(time.time()+10)
+            cache = _envcache.EnvCache()
+            cache.get('paths', discover, [str(depfile)])
+            assert ncalls[0] == 2
+            cache.save()
+
+          # invalidated by removal of any of the discovered paths
+            incdir.remove()
+            cache = _envcache.EnvCache()
+            cache.get('paths', discover, [str(depfile)])
+            assert ncalls[0] == 3
+
+            os.environ['CPPYY_ENV_CACHE'] = 'none'
+            assert _envcache.EnvCache().fname is None
+        finally:
+            if oldcache is None:
+                del os.environ['CPPYY_ENV_CACHE']
+            else:
+                os.environ['CPPYY_ENV_CACHE'] = oldcache
+
+    def test34_lazy_std(self):
+        """Deferred setup of std bindings (needs a fresh process)"""
+
+        import subprocess
+
+        env = os.environ.copy()
+        env['CPPYY_LAZY_STD'] = '1'
+        stmt = """if 1:
+            import cppyy
+            std = cppyy.gbl.std
+            assert type(std.__dict__['make_shared']) is cppyy._lazy_attribute
+            assert std.int8_t is cppyy.gbl.int8_t
+            assert std.uint8_t is cppyy.gbl.uint8_t
+            assert std.make_shared[int](42).__deref__() == 42
+            assert type(std.__dict__['make_shared']) is not cppyy._lazy_attribute
+            assert std.make_unique is std.make_unique
+            from cppyy.gbl.std import make_unique
+            assert make_unique[int](13).__deref__() == 13"""
+        assert subprocess.call([sys.executable, '-c', stmt], env=env) == 0
+
+    def test35_cppdef_many(self):
+        """Declaration of many C++ snippets in one go"""
+
+        import cppyy
+
+        assert cppyy.cppdef_many([
+            "namespace cppdef_many { int f1() { return 1; } }",
+            "namespace cppdef_many { int f2() { return f1() + 1; } }"])
+        assert cppyy.gbl.cppdef_many.f2() == 2
+
+        with raises(SyntaxError) as exc:
+            cppyy.cppdef_many([
+                "namespace cppdef_many { int f3() { return 3; } }",
+                "namespace cppdef_many { int f4() { return does_not_exist; } }",
+                "namespace cppdef_many { int f5() { return 5 } }"])
+        assert exc.value.snippets == [1, 2]
+        assert "cppdef_many[1]:1:" in str(exc.value)
+        assert "does_not_exist" in str(exc.value)
+        assert not hasattr(cppyy.gbl.cppdef_many, 'f3')   # none declared
+
+        with cppyy.transaction():
+            cppyy.cppdef("namespace cppdef_many { int f6() { return 6; } }")
+            with cppyy.transaction():
+                cppyy.cppdef("namespace cppdef_many { int f7() { return f6() + 1; } }")
+        assert cppyy.gbl.cppdef_many.f7() == 7
+
+        try:
+            with cppyy.transaction():
+                cppyy.cppdef("namespace cppdef_many { int f8() { return 8; } }")
+                raise RuntimeError("abort")
+        except RuntimeError:
+            pass
+        assert not hasattr(cppyy.gbl.cppdef_many, 'f8')
+
+    def test36_cppdef_async(self):
+        """Declarations and includes on a background thread"""
+
+        import cppyy
+
+        f1 = cppyy.cppdef_async("namespace cppdef_async { int f1() { return 1; } }")
+        f2 = cppyy.cppdef_async("namespace cppdef_async { int f2() { return f1() + 1; } }")
+        assert f2.result() and f1.done()    # queued work is done in order
+        assert cppyy.gbl.cppdef_async.f2() == 2
+
+        f3 = cppyy.cppdef_async("namespace cppdef_async { int f3() { return 3 } }")
+        with raises(SyntaxError):
+            f3.result()
+
+        f4 = cppyy.include_async("does_not_exist.h")
+        assert type(f4.exception()) == ImportError
+        assert "does_not_exist.h" in str(f4.exception())
+
+      # other threads run while Cling processes the code (GIL is released)
+        import threading, time
+        src = """namespace cppdef_async {
+        template<int N> struct Fib { static constexpr long value = Fib<N-1>::value + Fib<N-2>::value; };
+        template<> struct Fib<1> { static constexpr long value = 1; };
+        template<> struct Fib<0> { static constexpr long value = 0; };
+        %s }""" % '\n'.join('template<int N> struct W%d { static constexpr long v = Fib<N>::value; }; '
+                            'long w%d = W%d<%d>::v;' % (i, i, i, 80+i%10) for i in range(1500))
+
+        ticks, done = [], threading.Event()
+        def ticker():
+            while not done.is_set():
+                ticks.append(time.perf_counter())
+                time.sleep(0.005)
+        t = threading.Thread(target=ticker)
+        t.start()
+        start = time.perf_counter()
+        assert cppyy.cppdef_async(src).result()
+        stop = time.perf_counter()
+        done.set()
+        t.join()
+        assert 10 <= len([x for x in ticks if start < x < stop])
+        assert cppyy.gbl.cppdef_async.w1499 == cppyy.gbl.cppdef_async.Fib[89].value
+
+    def test37_include_cache(self, tmpdir):
+        """Repeated includes of the same header"""
+
+        import cppyy
+
+        header = tmpdir.join('include_cache.h')
+      # no include guard: a repeated include would fail on the redefinition
+        header.write("namespace include_cache { int f() { return 42; } }\n")
+        cppyy.add_include_path(str(tmpdir))
+
+        stats = cppyy.include_stats()
+        assert cppyy.include('include_cache.h')
+        assert cppyy.include('include_cache.h')
+        assert cppyy.include(str(header))           # same file, other name
+        assert cppyy.include_stats()['hits']   == stats['hits'] + 2
+        assert cppyy.include_stats()['misses'] == stats['misses'] + 1
+        assert cppyy.gbl.include_cache.f() == 42
+
+        cheader = tmpdir.join('include_cache_c.h')
+        cheader.write("int include_cache_cf() { return 42; }\n")
+        assert cppyy.c_include('include_cache_c.h')
+        assert cppyy.c_include('include_cache_c.h')
+        assert cppyy.include_stats()['hits']   == stats['hits'] + 3
+        assert cppyy.include_stats()['misses'] == stats['misses'] + 2
+        assert cppyy.gbl.include_cache_cf() == 42
+
+        with raises(ImportError):
+            cppyy.include('include_cache_does_not_exist.h')
+        with raises(ImportError):                   # failures are not cached
+            cppyy.include('include_cache_does_not_exist.h')
+
+    def test38_sizeof_typeid_many(self):
+        """Sizes and type information of many types in one go"""
+
+        import cppyy, ctypes
+
+        cppyy.cppdef("""namespace sizeof_many {
+        struct A { int a; };
+        struct B { double b[3]; };
+        typedef A A_t; }""")
+
+        ns = cppyy.gbl.sizeof_many
+        sizes = cppyy.sizeof_many([ns.A, "sizeof_many::B", "sizeof_many::A_t", ctypes.c_short, ns.B()])
+        assert sizes == [ctypes.sizeof(ctypes.c_int), 3*ctypes.sizeof(ctypes.c_double),
+                         ctypes.sizeof(ctypes.c_int), ctypes.sizeof(ctypes.c_short),
+                         3*ctypes.sizeof(ctypes.c_double)]
+        assert cppyy.sizeof("sizeof_many::A") == sizes[0]
+        assert cppyy.sizeof("unsigned  int") == cppyy.sizeof("unsigned int")
+
+        with raises(TypeError) as exc:
+            cppyy.sizeof_many(["int", "sizeof_many::C", "double", "sizeof_many::D"])
+        assert "sizeof_many::C" in str(exc.value)
+        assert "sizeof_many::D" in str(exc.value)
+        assert not "double" in str(exc.value)
+        assert cppyy.sizeof("double") == ctypes.sizeof(ctypes.c_double)
+
+        tids = cppyy.typeid_many([ns.A, "sizeof_many::A_t", "sizeof_many::B"])
+        assert tids[0] is tids[1]                   # typedef resolved
+        assert tids[0] == cppyy.typeid("sizeof_many::A")
+        assert tids[2] == cppyy.typeid(ns.B())
+        assert tids[0] != tids[2]
+
+        with raises(TypeError):
+            cppyy.typeid("sizeof_many::C")
+
+    def test39_stderr_capture(self):
+        """Pass C++ diagnostics through to stderr"""
+
+        import cppyy
+
+        with raises(SyntaxError) as exc:
+            cppyy.cppdef("int stderr_capture1() { return 1 }")
+        assert "expected ';'" in str(exc.value)
+
+        cppyy.set_stderr_capture(False)
+        try:
+            with raises(SyntaxError) as exc:
+                cppyy.cppdef("int stderr_capture2() { return 2 }")
+            assert not "expected ';'" in str(exc.value)
+            assert cppyy.cppdef("int stderr_capture3() { return 3; }")
+        finally:
+            cppyy.set_stderr_capture(True)
+        assert cppyy.gbl.stderr_capture3() == 3
+
+      # internal attempts (such as of compiling cppexec statements) stay silent
+        import subprocess
+        stmt = """if 1:
+            import cppyy
+            cppyy.set_stderr_capture(False)
+            assert cppyy.cppexec("int stderr_capture4 = 4")"""
+        p = subprocess.run([sys.executable, '-c', stmt], stderr=subprocess.PIPE)
+        assert p.returncode == 0
+        assert not b'error' in p.stderr
+
+    def test40_template_manifest(self, tmpdir):
+        """Recording and replay of template instantiations (needs fresh processes)"""
+
+        import json, subprocess
+
+        env = os.environ.copy()
+        env['CPPYY_TEMPLATE_MANIFEST'] = str(tmpdir.join('manifest.json'))
+        decl = """cppyy.cppdef("template<typename T> struct Manifest { T m; };")"""
+
+        stmt = """if 1:
+            import cppyy
+            assert cppyy.replay_instantiations() == 0
+            cppyy.gbl.std.vector['short']
+            %s
+            cppyy.gbl.Manifest['int']""" % decl
+        assert subprocess.call([sys.executable, '-c', stmt], env=env) == 0
+
+        manifest = json.load(open(env['CPPYY_TEMPLATE_MANIFEST']))
+        assert manifest['names'] == ['std::vector<short>', 'Manifest<int>']
+
+        stmt = """if 1:
+            import cppyy
+            assert cppyy._template_manifest.pending() == ['Manifest<int>']
+            %s
+            assert cppyy.replay_instantiations() == 1
+            assert cppyy.replay_instantiations() == 0
+            assert cppyy.gbl.Manifest['int'].__cpp_name__ == 'Manifest<int>'""" % decl
+        assert subprocess.call([sys.executable, '-c', stmt], env=env) == 0
+
+    def test41_cppdef_cache_runs(self, tmpdir):
+        """Hits from, and edits of, the persistent cppdef cache (needs fresh processes)"""
+
+        import subprocess
+
+        env = os.environ.copy()
+        env['CPPYY_CPPDEF_CACHE'] = str(tmpdir.join('cppdef_cache'))
+        env.pop('CLING_STANDARD_PCH', None)  # as selected by this process
+
+        script = tmpdir.join('cppdef_cache_prog.py')
+        prog = """if 1:
+            import cppyy
+            cppyy.cppdef("namespace cppdef_cache { int f(int i) { return i*%d; } }")
+            assert cppyy.gbl.cppdef_cache.f(2) == %d
+            assert cppyy._cppdef_cache.hits == %d"""
+
+        def run(factor, hits):
+            script.write(prog % (factor, 2*factor, hits))
+            mtime = 1E9+factor             # only edits of the source count
+            os.utime(str(script), (mtime, mtime))
+            return subprocess.call([sys.executable, str(script)], env=env)
+
+      # the second run declares through the PCH built at the end of the first
+        assert run(2, 0) == 0
+        assert run(2, 1) == 0
+
+      # an edited source replaces the cached one
+        assert run(3, 0) == 0
+        assert run(3, 1) == 0
+
+      # a conflicting definition drops the cached one, for use on the next start
+        stmt = """if 1:
+            import cppyy
+            try:
+                cppyy.cppdef("namespace cppdef_cache { int g() { return %d; } }")
+            except SyntaxError as e:
+                assert 'dropped from the cppdef cache' in str(e)
+                raise SystemExit(2)
+            assert cppyy.gbl.cppdef_cache.g() == %d"""
+        assert subprocess.call([sys.executable, '-c', stmt % (1, 1)], env=env) == 0
+        assert subprocess.call([sys.executable, '-c', stmt % (2, 2)], env=env) == 2
+        assert subprocess.call([sys.executable, '-c', stmt % (2, 2)], env=env) == 0
+
+    def test42_user_pch(self, tmpdir):
+        """Building a PCH of user headers and selecting it (needs fresh processes)"""
+
+        import subprocess
+
+        env = os.environ.copy()
+        env.pop('CLING_STANDARD_PCH', None)  # as selected by this process
+
+        incdir = tmpdir.mkdir('include')
+        header = incdir.join('user_pch.h')
+        header.write("namespace user_pch { inline int f() { return 42; } }")
+
+        pchname = str(tmpdir.join('user.pch'))
+        assert subprocess.call([sys.executable, '-m', 'cppyy.pch', '-o', pchname,
+                                '-I', str(incdir), 'user_pch.h'], env=env) == 0
+        assert os.path.exists(pchname) and os.path.exists(pchname+'.json')
+
+      # the headers are available without include, and so are their paths
+        env['CPPYY_PCH'] = pchname
+        stmt = """if 1:
+            import os, cppyy
+            assert os.environ['CLING_STANDARD_PCH'] == %r
+            assert cppyy.gbl.user_pch.f() == 42
+            assert cppyy.include('user_pch.h')""" % pchname
+        assert subprocess.call([sys.executable, '-c', stmt], env=env) == 0
+
+      # an edited header makes the PCH out of date
+        st = os.stat(pchname)
+        os.utime(str(header), (st.st_atime, st.st_mtime+10))
+        stmt = """if 1:
+            import os, warnings
+            with warnings.catch_warnings(record=True) as w:
+                warnings.simplefilter('always')
+                import cppyy
+            assert 'out of date' in str(w[0].message)
+            assert os.environ.get('CLING_STANDARD_PCH') != %r""" % pchname
+        assert subprocess.call([sys.executable, '-c', stmt], env=env) == 0
+
 
 class TestSIGNALS:
     def setup_class(cls):
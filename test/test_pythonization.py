@@ -257,6 +257,257 @@ class TestClassPYTHONIZATION:
 
         assert cppyy.gbl.pyzables.WithCallback2.klass_name == 'pyzables::WithCallback3'
 
+    def test10_indexed_dispatch(self):
+        """Pythonizors with a match_class regex are only called for matching classes"""
+
+        import cppyy, re
+
+        cppyy.cppdef("""namespace indexed_dispatch {
+        struct Exact {}; struct ExactNot {}; struct PrefixA {}; struct PrefixB {};
+        struct Pattern1 {}; struct Pattern22 {}; struct Other {}; }""")
+
+        called = []
+        class pythonizor(object):
+            def __init__(self, tag, match_class):
+                self.tag = tag
+                self.match_class = re.compile(match_class)
+            def __call__(self, klass, name):
+                assert self.match_class.match(name)
+                called.append((self.tag, name))
+
+        pythonizors = [pythonizor('exact', 'Exact$'), pythonizor('prefix', 'Prefix'),
+                       pythonizor('regex', r'Pattern\d$'), pythonizor('backref', r'Pattern(\d)\1$'),
+                       pythonizor('any', '.*')]
+        for p in pythonizors:
+            cppyy.py.add_pythonization(p, 'indexed_dispatch')
+
+        stats = cppyy.py.dispatch_stats()
+
+        ns = cppyy.gbl.indexed_dispatch
+        for name in ['Exact', 'ExactNot', 'PrefixA', 'Pattern1', 'Pattern22']:
+            getattr(ns, name)
+        assert called == [('exact', 'Exact'), ('any', 'Exact'), ('any', 'ExactNot'),
+                          ('prefix', 'PrefixA'), ('any', 'PrefixA'),
+                          ('regex', 'Pattern1'), ('any', 'Pattern1'),
+                          ('backref', 'Pattern22'), ('any', 'Pattern22')]
+
+        new_stats = cppyy.py.dispatch_stats()
+        assert new_stats['classes'] - stats['classes'] == 5
+        assert new_stats['called']  - stats['called']  == 9
+        assert new_stats['skipped'] - stats['skipped'] == 5*5-9
+
+        for p in pythonizors[1:]:
+            assert cppyy.py.remove_pythonization(p, 'indexed_dispatch') == True
+        del called[:]
+        ns.PrefixB, ns.Other
+        assert not called
+
+      # patterns with named groups can not be combined, but still match
+        cppyy.cppdef("""namespace indexed_dispatch_named {
+        struct Foo {}; struct Bar {}; struct Baz {}; }""")
+
+        pythonizors = [pythonizor('foo', '(?P<cls>Foo)$'), pythonizor('bar', '(?P<cls>Bar)$'),
+                       pythonizor('ba', r'Ba\w')]
+        for p in pythonizors:
+            cppyy.py.add_pythonization(p, 'indexed_dispatch_named')
+
+        ns = cppyy.gbl.indexed_dispatch_named
+        ns.Foo, ns.Bar, ns.Baz
+        assert called == [('foo', 'Foo'), ('bar', 'Bar'), ('ba', 'Bar'), ('ba', 'Baz')]
+
+    def test11_factories_bind_only_matches(self):
+        """Pythonization factories only retrieve the members that match"""
+
+        import cppyy
+
+        cppyy.cppdef("""namespace factory_matches {
+        int get_value() { return 42; }
+        int set_value(int) { return 0; }
+        int other_value() { return 13; }
+        struct NotBound {};
+        struct Data { int fInt = 7; int GetInt() { return fInt; } void SetInt(int i) { fInt = i; } }; }""")
+
+        ns = cppyy.gbl.factory_matches
+        cppyy.py.set_method_property('factory_matches', 'get_', '__release_gil__', True)(ns, 'factory_matches')
+        cppyy.py.add_overload('factory_matches', 'set_', lambda *args: 1)(ns, 'factory_matches')
+
+        assert 'get_value' in ns.__dict__
+        assert 'set_value' in ns.__dict__
+        assert not 'other_value' in ns.__dict__
+        assert not 'NotBound' in ns.__dict__
+        assert ns.get_value.__release_gil__
+
+        cppyy.py.add_pythonization(
+            cppyy.py.make_property('Data', 'Get(\\w+)', 'Set(\\w+)', prop_name='{}_'), 'factory_matches')
+        cppyy.py.add_pythonization(
+            cppyy.py.rename_attribute('Data', 'fInt', 'value'), 'factory_matches')
+
+        d = ns.Data()
+        assert d.Int_ == 7
+        d.Int_ = 17
+        assert d.GetInt() == 17
+        assert d.value == 17
+        d.value = 27
+        assert d.Int_ == 27
+
+    def test12_property_binding(self):
+        """Properties call the C++ accessors directly, unless virtual"""
+
+        import cppyy
+
+        cppyy.cppdef("""namespace property_binding {
+        struct Plain { int fX = 3; int GetX() { return fX; } void SetX(int x) { fX = x; } };
+        struct Base { virtual ~Base() {}
+            int fX = 3; virtual int GetX() { return fX; } virtual void SetX(int x) { fX = x; } };
+        struct Derived : Base { int GetX() override { return 2*fX; } void SetX(int x) override { fX = x+1; } };
+        Base* make_derived() { return new Derived{}; }
+        struct PlainHiding : Plain { int GetX() { return 42; } }; }""")
+
+        ns = cppyy.gbl.property_binding
+        cppyy.py.add_pythonization(
+            cppyy.py.make_property('Plain|Base', 'Get(\\w+)', 'Set(\\w+)'), 'property_binding')
+
+        # non-polymorphic: the C++ overloads themselves are used
+        assert type(ns.Plain.__dict__['X'].fget) is type(ns.Plain.GetX)
+        assert type(ns.Plain.__dict__['X'].fset) is type(ns.Plain.SetX)
+        assert not type(ns.Base.__dict__['X'].fget) is type(ns.Base.GetX)
+        p = ns.Plain()
+        assert p.X == 3
+        p.X = 5
+        assert p.X == 5 and p.fX == 5
+
+      # unless derived classes redefine accessors
+        class PyPlain(ns.Plain):
+            def GetX(self):
+                return 99
+        class PyPlain2(PyPlain):
+            pass
+        class PyPlainUnchanged(ns.Plain):
+            pass
+
+        for kls in [PyPlain, PyPlain2]:
+            p = kls()
+            assert p.X == 99
+            p.X = 7
+            assert p.fX == 7
+        assert type(PyPlainUnchanged.__dict__.get('X', None)) is not property
+        assert PyPlainUnchanged().X == 3
+        assert ns.PlainHiding().X == 42
+
+        # polymorphic: accessors dispatch to overrides
+        b = ns.Base()
+        b.X = 5
+        assert b.X == 5
+        for d in [ns.Derived(), ns.make_derived()]:
+            d.X = 5
+            assert d.fX == 6
+            assert d.X == 12
+
+    def test13_compose_batch(self):
+        """Composed methods with batch calls and vectorized post-processors"""
+
+        import cppyy
+
+        cppyy.cppdef("""namespace compose_batch {
+        struct Scaler { int fScale = 3; int Scale(int i, int offset = 0) { return fScale*i+offset; } };
+        struct VScaler { int fScale = 3; int Scale(int i) { return fScale*i; } };
+        struct Clash { int get(int i) { return i; } int get_batch(int i) { return -i; } };
+        struct Twice { int Scale(int i) { return 3*i; } }; }""")
+
+        ncalls = []
+        def add_one(self, result):
+            return result+1
+        def add_scale(self, results):
+            ncalls.append(len(results))
+            return [r+self.fScale for r in results]
+
+        cppyy.py.add_pythonization(
+            cppyy.py.compose_method('Scaler$', 'Scale$', add_one), 'compose_batch')
+        cppyy.py.add_pythonization(
+            cppyy.py.compose_method('VScaler$', 'Scale$', add_scale, vectorized=True), 'compose_batch')
+
+        s = cppyy.gbl.compose_batch.Scaler()
+        assert s.Scale(2) == 7
+        assert s.Scale(2, 1) == 8
+        assert s.Scale(2, offset=2) == 9
+        assert s.Scale_batch([(1,), (2,), (3, 1)]) == [4, 7, 11]
+        assert s.Scale_batch([]) == []
+
+        v = cppyy.gbl.compose_batch.VScaler()
+        v.fScale = 2
+        assert v.Scale(2) == 6
+        assert ncalls == [1]
+        assert v.Scale_batch((i,) for i in range(4)) == [2, 4, 6, 8]
+        assert ncalls == [1, 4]
+
+      # no batch version if the name is taken by a C++ method, which is itself
+      # composed if matching; nor composition of another batch version
+        cppyy.py.add_pythonization(
+            cppyy.py.compose_method('Clash$', 'get', add_one), 'compose_batch')
+        for i in range(2):
+            cppyy.py.add_pythonization(
+                cppyy.py.compose_method('Twice$', 'Scale', add_one), 'compose_batch')
+
+        c = cppyy.gbl.compose_batch.Clash()
+        assert c.get(2) == 3
+        assert c.get_batch(2) == -1
+
+        t = cppyy.gbl.compose_batch.Twice()
+        assert t.Scale(2) == 8
+        assert t.Scale_batch([(1,), (2,)]) == [5, 8]
+
+    def test14_pythonization_stats(self):
+        """Profile calls, time, and exceptions of pythonizors"""
+
+        import cppyy, json
+
+        cppyy.cppdef("""namespace profiled {
+        struct Good1 {}; struct Good2 {}; struct Bad {}; struct Unprofiled {}; }""")
+
+        def profiled_pythonizor(klass, name):
+            if name == 'Bad':
+                raise RuntimeError('bad class')
+            klass.profiled = True
+
+        cppyy.py.add_pythonization(profiled_pythonizor, 'profiled')
+        cppyy.py.pythonization_stats(reset=True)
+
+        ns = cppyy.gbl.profiled
+        ns.Unprofiled
+        assert not cppyy.py.pythonization_stats()
+
+        cppyy.py.set_pythonization_profiling()
+        try:
+            assert ns.Good1.profiled and ns.Good2.profiled
+            with raises(AttributeError):
+                ns.Bad
+            cppyy.gbl.std.tuple['profiled::Good1', int]
+        finally:
+            cppyy.py.set_pythonization_profiling(False)
+
+        stats = cppyy.py.pythonization_stats()
+        assert json.loads(json.dumps(stats)) == stats
+
+        label = [l for l in stats if 'profiled_pythonizor' in l]
+        assert len(label) == 1
+        pstats = stats[label[0]]
+        assert pstats['scope'] == 'profiled'
+        assert pstats['calls'] == 3
+        assert pstats['exceptions'] == 1
+        assert sorted(pstats['classes']) == ['profiled::Bad', 'profiled::Good1', 'profiled::Good2']
+        assert pstats['classes']['profiled::Bad']['exceptions'] == 1
+        assert 0. < pstats['classes']['profiled::Good1']['time'] <= pstats['time']
+
+        label = [l for l in stats if '_standard_pythonizations' in l]
+        assert len(label) == 1
+        sstats = stats[label[0]]
+        assert sstats['scope'] == 'std'
+        assert [c for c in sstats['classes'] if 'tuple<profiled::Good1' in c]
+
+        assert cppyy.py.pythonization_stats(reset=True) == stats
+        assert not cppyy.py.pythonization_stats()
+        cppyy.py.remove_pythonization(profiled_pythonizor, 'profiled')
+
 
 ## actual test run
 if __name__ == '__main__':
@@ -789,6 +789,127 @@ class TestSTLVECTOR:
         for f, d in zip(x, v):
             assert f == d
 
+    def test24_buffer_construction_and_iadd(self):
+        """Bulk copies from objects exposing the buffer protocol"""
+
+        import cppyy, array
+
+        std = cppyy.gbl.std
+
+        a = array.array('d', range(10))
+        v = std.vector(a)                      # deduced from buffer format
+        assert type(v) == std.vector['double']
+        assert list(v) == list(a)
+        assert type(std.vector(array.array('i', [1]))) == std.vector[int]
+
+        v += a
+        assert len(v) == 20
+        assert list(v[10:]) == list(a)
+
+        v += memoryview(a)[2:5]                # contiguous slice
+        assert list(v[20:]) == [2., 3., 4.]
+
+        v += memoryview(a)[::3]                # strided: element-wise
+        assert list(v[23:]) == [0., 3., 6., 9.]
+
+        v += array.array('f', [1., 2.])        # other type: element-wise
+        assert list(v[27:]) == [1., 2.]
+
+        v2 = std.vector[int]()
+        v2 += array.array('i', range(5))
+        v2 += [5, 6]
+        assert list(v2) == list(range(7))
+
+      # signed char buffers are appended element-wise (no bulk conversion)
+        v3 = std.vector(array.array('b', [1, 2, 3]))
+        assert type(v3) == std.vector['signed char']
+        v3 += array.array('b', [4, 5])
+        assert [ord(v3[i]) for i in range(len(v3))] == [1, 2, 3, 4, 5]
+
+    def test25_array_interface(self):
+        """Zero-copy views of vectors through the numpy array interface"""
+
+        import cppyy, ctypes, sys
+
+        std = cppyy.gbl.std
+        order = sys.byteorder == 'little' and '<' or '>'
+
+        v = std.vector['double'](range(5))
+        ai = v.__array_interface__
+        assert ai['shape'] == (5,)
+        assert ai['typestr'] == order+'f8'
+        assert list((ctypes.c_double*5).from_address(ai['data'][0])) == list(v)
+
+        assert std.vector['unsigned short']([1]).__array_interface__['typestr'] == order+'u2'
+        assert std.vector[int]().__array_interface__['shape'] == (0,)
+        assert std.vector['std::array<int, 2>'](3).__array_interface__['shape'] == (3, 2)
+
+        assert not hasattr(std.vector['bool'](), '__array_interface__')
+        assert not hasattr(std.vector['std::string'](), '__array_interface__')
+
+        try:
+            import numpy as np
+        except ImportError:
+            skip('numpy is not installed')
+
+        a = v.as_numpy()
+        assert a.dtype == np.float64 and list(a) == list(v)
+        a[1] = 42.
+        assert v[1] == 42.                     # shared storage
+        assert np.asarray(v).base is v
+
+        g = v.as_numpy(guard=True)
+        for i in range(100):
+            v.push_back(i)                     # reallocates
+        assert list(g) == [0., 42., 2., 3., 4.]
+        assert len(v) == 105 and v[1] == 42.
+
+      # the bookkeeping of guarded views goes with the last such view
+        import gc
+        nguarded = len(cppyy._array_guards)
+        g1, g2 = v.as_numpy(guard=True), v.as_numpy(guard=True)
+        assert len(cppyy._array_guards) == nguarded+1
+        del g1; gc.collect()
+        assert len(cppyy._array_guards) == nguarded+1
+        del g2; gc.collect()
+        assert len(cppyy._array_guards) == nguarded
+
+        with raises(TypeError):
+            std.vector['bool']().as_numpy()
+
+    def test26_string_vector_conversions(self):
+        """Bulk conversions of vectors of strings to and from Python"""
+
+        import cppyy
+
+        std = cppyy.gbl.std
+
+        v = std.vector['std::string'](['aap', b'noot', u'mïes'])
+        assert len(v) == 3
+        assert v.tolist() == ['aap', 'noot', u'mïes']
+
+        v += ('zus', 'jet')
+        v += std.vector['std::string'](['teun'])
+        assert v.tolist()[3:] == ['zus', 'jet', 'teun']
+        assert len(std.vector['std::string'](3)) == 3
+
+        offsets, data = v.to_buffers()
+        assert list(offsets) == [0, 3, 7, 12, 15, 18, 22]
+        assert data == u'aapnootmïeszusjetteun'.encode('utf-8')
+
+        with raises(TypeError):
+            std.vector['std::string'](['aap', 1])
+
+      # bound std::string objects are added one by one
+        v = std.vector['std::string']([std.string('aap'), 'noot'])
+        v += [std.string('mies')]
+        assert v.tolist() == ['aap', 'noot', 'mies']
+
+        v = std.vector['std::string']([b'\xff', 'aap'])
+        with raises(UnicodeDecodeError):
+            v.tolist()
+        assert v.tolist(errors='replace') == [u'�', 'aap']
+
 
 class TestSTLSTRING:
     def setup_class(cls):
@@ -1379,6 +1500,43 @@ class TestSTLMAP:
             m = mtype['std::string', ns.Base]((("aap", ns.Derived()), ("noot", ns.Derived())))
             assert len(m) == 2
 
+    def test09_dict_conversions(self):
+        """Bulk conversion of maps to and from Python dicts"""
+
+        import cppyy
+        std = cppyy.gbl.std
+
+        for mtype in (std.map, std.unordered_map):
+            d = {'aap' : 1., 'noot' : 2., 'mies' : 3.}
+            m = mtype['std::string', 'double'].from_dict(d)
+            assert len(m) == 3 and m['noot'] == 2.
+            assert m.to_dict() == d
+
+            m = mtype[int, 'unsigned int'].from_dict({1 : 2, 3 : 4})
+            assert m.to_dict() == {1 : 2, 3 : 4}
+
+            with raises(TypeError):
+                mtype['std::string', 'double'].from_dict({1 : 1.})
+            with raises(TypeError):
+                mtype['std::string', 'double'].from_dict({'1' : '1'})
+            with raises(ValueError):
+                mtype['short', int].from_dict({1<<20 : 1})
+            with raises(OverflowError):
+                mtype['unsigned int', int].from_dict({-1 : 1})
+
+          # types without bulk conversion are converted per element
+            m = mtype[int, 'std::vector<int>'].from_dict({1 : [1, 2]})
+            assert list(m.to_dict()[1]) == [1, 2]
+
+          # used for construction from a dict
+            m = mtype({'1' : 2.})
+            assert type(m) == mtype['std::string', 'double']
+            assert m.to_dict() == {'1' : 2.}
+
+          # bound std::string keys are converted per element
+            m = mtype({std.string('1') : 2., std.string('3') : 4.})
+            assert m.to_dict() == {'1' : 2., '3' : 4.}
+
 
 class TestSTLITERATOR:
     def setup_class(cls):
@@ -1628,6 +1786,18 @@ class TestSTLARRAY:
         with raises(TypeError):
             cppyy.gbl.std.array["double",3](['a', 1.0, 1.0])
 
+    def test05_array_interface(self):
+        """Zero-copy views of (nested) arrays through the numpy array interface"""
+
+        import cppyy, ctypes
+
+        a = cppyy.gbl.std.array['std::array<float, 3>', 4]()
+        a[2][1] = 3.
+        ai = a.__array_interface__
+        assert ai['shape'] == (4, 3)
+        assert ai['typestr'][1:] == 'f4'
+        assert (ctypes.c_float*12).from_address(ai['data'][0])[7] == 3.
+
 
 class TestSTLSTRING_VIEW:
     def setup_class(cls):
@@ -1902,6 +2072,39 @@ class TestSTLTUPLE:
         assert s1.fInt == 42
         assert s2.fInt == 42
 
+    def test05_tuple_astuple(self):
+        """Conversion of the full tuple in one call"""
+
+        import cppyy
+        std = cppyy.gbl.std
+
+        t = std.make_tuple(1, 'aap', 5.)
+        assert t.astuple() == (1, 'aap', 5.)
+        assert type(t.astuple()[1]) == str
+        assert t[-1] == 5.
+        with raises(IndexError):
+            t[3]
+
+        Simple = cppyy.gbl.TupleLifeLine.Simple
+
+        t = std.make_tuple(Simple(), 3)
+        s, i = t.astuple()
+        del t
+        assert s.fInt == 42 and i == 3
+
+        assert std.make_tuple().astuple() == ()
+
+      # unpacking gives the same as indexing
+        t = std.make_tuple(1, std.string('aap'))
+        a, b = t
+        assert a == 1 and type(b) == type(t[1])
+
+      # conversion errors are raised as such
+        t = std.make_tuple(1, std.string(b'\xff'))
+        with raises(UnicodeDecodeError):
+            t.astuple()
+        a, b = t
+
 
 class TestSTLPAIR:
     def setup_class(cls):
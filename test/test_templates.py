@@ -1163,6 +1163,63 @@ class TestTEMPLATES:
         assert ns.stringify["const char*"]("Aap")                    == "Aap "
         assert ns.stringify(ctypes.c_char_p(bytes("Noot", "ascii"))) == "Noot "
 
+    def test35_instantiate_many(self):
+        """Instantiation of many template classes in one go"""
+
+        import cppyy
+
+        cppyy.cppdef("""\
+        namespace InstantiateMany {
+        template<typename T, int N = 1>
+        struct A { T m_data[N]; };
+        struct B {}; }""")
+
+        ns = cppyy.gbl.InstantiateMany
+
+        classes = ns.A.instantiate_many([int, 'double', (ns.B, 3), ('float', 2)])
+        assert [c.__cpp_name__ for c in classes] == [
+            'InstantiateMany::A<int,1>', 'InstantiateMany::A<double,1>',
+            'InstantiateMany::A<InstantiateMany::B,3>', 'InstantiateMany::A<float,2>']
+        assert ns.A[int]          is classes[0]
+        assert ns.A[ns.B, 3]      is classes[2]
+        assert ns.A['float', 2]   is classes[3]
+        assert len(ns.A[ns.B, 3]().m_data) == 3
+
+        classes = cppyy.instantiate(['InstantiateMany::A<long>', 'std::vector<InstantiateMany::B>'])
+        assert ns.A['long'] is classes[0]
+        assert cppyy.gbl.std.vector[ns.B] is classes[1]
+
+        with raises(TypeError):
+            cppyy.instantiate(['InstantiateMany::A<int>', 'InstantiateMany::C<int>'])
+
+    def test36_canonical_template_args(self):
+        """Lookup of instantiations under different spellings of the arguments"""
+
+        import cppyy
+
+        cppyy.cppdef("""\
+        namespace CanonicalArgs {
+        template<typename T, typename U = int>
+        struct A {};
+        typedef int Int_t; }""")
+
+        ns = cppyy.gbl.CanonicalArgs
+
+        stats = cppyy.template_stats()
+        cls = ns.A[int]
+        assert cppyy.template_stats()['misses'] == stats['misses'] + 1
+
+        for spelling in ['int', ' int ', 'CanonicalArgs::Int_t', (int, int), 'int, int']:
+            assert ns.A[spelling] is cls
+        assert cppyy.template_stats()['misses'] == stats['misses'] + 1
+        assert cppyy.template_stats()['canonical_hits'] == stats['canonical_hits'] + 5
+
+        assert ns.A['int'] is cls
+        assert cppyy.template_stats()['hits'] == stats['hits'] + 1
+
+        assert ns.A[float] is not cls
+        assert cppyy.template_stats()['misses'] == stats['misses'] + 2
+
 
 class TestTEMPLATED_TYPEDEFS:
     def setup_class(cls):